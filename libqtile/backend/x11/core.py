@@ -20,8 +20,18 @@
 # SOFTWARE.
 
 import asyncio
+import operator
 import os
-from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple
+import time
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 import xcffib
 import xcffib.render
@@ -34,8 +44,6 @@ from libqtile.log_utils import logger
 from libqtile.utils import QtileError
 
 if TYPE_CHECKING:
-    from typing import Dict
-
     from libqtile.core.manager import Qtile
 
 _IGNORED_EVENTS = {
@@ -49,6 +57,54 @@ _IGNORED_EVENTS = {
     xcffib.xproto.ReparentNotifyEvent,
 }
 
+# Catch some bad X exceptions. Since X is event based, race conditions can occur
+# almost anywhere in the code. For example, if a window is created and then
+# immediately destroyed (before the event handler is evoked), when the event
+# handler tries to examine the window properties, it will throw a WindowError
+# exception. We can essentially ignore it, since the window is already dead and
+# we've got another event in the queue notifying us to clean it up.
+_IGNORED_ERRORS = (
+    xcffib.xproto.WindowError,
+    xcffib.xproto.AccessError,
+    xcffib.xproto.DrawableError,
+    xcffib.xproto.GContextError,
+    xcffib.xproto.PixmapError,
+    xcffib.render.PictureError,
+)
+
+# Certain events expose the affected window id as an "event" attribute.
+_WINDOW_EVENT_TYPES = {
+    "EnterNotify",
+    "LeaveNotify",
+    "MotionNotify",
+    "ButtonPress",
+    "ButtonRelease",
+    "KeyPress",
+}
+
+# Events that can be collapsed when several of them are queued, mapped to a
+# function giving the key under which they are collapsed
+_COALESCED_EVENTS = {
+    xcffib.xproto.MotionNotifyEvent: lambda e: (e.__class__, e.event),
+    xcffib.xproto.ConfigureRequestEvent: lambda e: (e.__class__, e.window),
+    xcffib.xproto.PropertyNotifyEvent: lambda e: (e.__class__, e.window, e.atom),
+    xcffib.xproto.ExposeEvent: lambda e: (e.__class__, e.window),
+}
+
+_CONFIGURE_REQUEST_FIELDS = (
+    ("x", xcffib.xproto.ConfigWindow.X),
+    ("y", xcffib.xproto.ConfigWindow.Y),
+    ("width", xcffib.xproto.ConfigWindow.Width),
+    ("height", xcffib.xproto.ConfigWindow.Height),
+    ("border_width", xcffib.xproto.ConfigWindow.BorderWidth),
+    ("sibling", xcffib.xproto.ConfigWindow.Sibling),
+    ("stack_mode", xcffib.xproto.ConfigWindow.StackMode),
+)
+
+# A dispatch entry is (event_type, window id getter, core handler, name of the
+# per-window handler)
+DispatchEntry = Tuple[str, Optional[Callable], Optional[Callable], str]
+
 
 def get_keys() -> List[str]:
     return list(xcbq.keysyms.keys())
@@ -62,6 +118,59 @@ class ExistingWMException(Exception):
     pass
 
 
+def _merge_configure_requests(old, new):
+    """Merge two ConfigureRequests for the same window into one
+
+    Values set by the newer request take precedence, values only set by the
+    older request are kept.
+    """
+    values = {}
+    for field, mask in _CONFIGURE_REQUEST_FIELDS:
+        source = new if new.value_mask & mask else old
+        values[field] = getattr(source, field)
+    return xcffib.xproto.ConfigureRequestEvent.synthetic(
+        parent=new.parent,
+        window=new.window,
+        value_mask=old.value_mask | new.value_mask,
+        **values
+    )
+
+
+def coalesce_events(events: List, dropped: Dict[str, int]) -> List:
+    """Collapse redundant events in a batch of queued events
+
+    Only the last MotionNotify per window, the last PropertyNotify per window
+    and atom and the last Expose per window are kept, and ConfigureRequests
+    for the same window are merged into one. Any other event acts as a
+    barrier: events are never collapsed across it, so e.g. the motion before a
+    button release is still handled before the release.
+
+    The number of dropped events per event type is added to `dropped`.
+    """
+    result = []  # type: List
+    pending = {}  # type: Dict[tuple, int]
+    for event in events:
+        get_key = _COALESCED_EVENTS.get(event.__class__)
+        if get_key is None:
+            pending.clear()
+            result.append(event)
+            continue
+
+        key = get_key(event)
+        index = pending.get(key)
+        if index is not None:
+            previous = result[index]
+            result[index] = None
+            if event.__class__ is xcffib.xproto.ConfigureRequestEvent:
+                event = _merge_configure_requests(previous, event)
+            event_type = event.__class__.__name__[:-5]
+            dropped[event_type] = dropped.get(event_type, 0) + 1
+        pending[key] = len(result)
+        result.append(event)
+
+    return [event for event in result if event is not None]
+
+
 class Core(base.Core):
     def __init__(self, display_name: str = None) -> None:
         """Setup the X11 core backend
@@ -115,8 +224,10 @@ class Core(base.Core):
         self._supporting_wm_check_window.set_property(
             "_NET_SUPPORTING_WM_CHECK", self._supporting_wm_check_window.wid
         )
+        # wait for the server to process these, so that other clients and window
+        # managers see that qtile is running from now on
         self._root.set_property(
-            "_NET_SUPPORTING_WM_CHECK", self._supporting_wm_check_window.wid
+            "_NET_SUPPORTING_WM_CHECK", self._supporting_wm_check_window.wid, checked=True
         )
 
         self._selection = {
@@ -153,12 +264,26 @@ class Core(base.Core):
         self._numlock_mask = xcbq.ModMasks.get(self.conn.get_modifier(numlock_code), 0)
         self._valid_mask = ~(self._numlock_mask | xcbq.ModMasks["lock"])
 
+        # maps event classes to their dispatch entry
+        self._dispatch_table = {}  # type: Dict[type, DispatchEntry]
+
+        self.coalesce_events = True
+        self._events_received = 0
+        self._events_dropped = {}  # type: Dict[str, int]
+
+        # helper connection and window for get_valid_timestamp
+        self._timestamp_conn = None  # type: Optional[xcffib.Connection]
+        self._timestamp_wid = 0
+
     def finalize(self) -> None:
         self.conn.conn.core.DeletePropertyChecked(
             self._root.wid,
             self.conn.atoms["_NET_SUPPORTING_WM_CHECK"],
         ).check()
         self.qtile = None
+        if self._timestamp_conn is not None:
+            self._timestamp_conn.disconnect()
+            self._timestamp_conn = None
         self.conn.finalize()
 
     def get_screen_info(self) -> List[Tuple[int, int, int, int]]:
@@ -197,6 +322,11 @@ class Core(base.Core):
     def masks(self) -> Tuple[int, int]:
         return self._numlock_mask, self._valid_mask
 
+    @property
+    def refresh_rate(self) -> float:
+        """The refresh rate of the display in Hz, 60 when RandR can't tell"""
+        return self.conn.refresh_rate or 60.
+
     def setup_listener(
         self, qtile: "Qtile"
     ) -> None:
@@ -209,6 +339,7 @@ class Core(base.Core):
         """
         logger.debug("Adding io watch")
         self.qtile = qtile
+        self.coalesce_events = qtile.config.coalesce_events
         self.fd = self.conn.conn.get_file_descriptor()
         asyncio.get_running_loop().add_reader(self.fd, self._xpoll)
 
@@ -224,20 +355,45 @@ class Core(base.Core):
         """Scan for existing windows"""
         assert self.qtile is not None
 
+        start = time.monotonic()
         _, _, children = self._root.query_tree()
+        # requests are sent for every window before waiting for any reply, so
+        # the scan costs two round trips: one to find the windows to manage,
+        # one to get everything else about them; manage() reuses the replies
         for item in children:
-            try:
-                attrs = item.get_attributes()
-                state = item.get_wm_state()
-            except (xcffib.xproto.WindowError, xcffib.xproto.AccessError):
-                continue
+            item.take_snapshot([("WM_STATE", xcffib.xproto.GetPropertyType.Any)])
 
-            if attrs and attrs.map_state == xcffib.xproto.MapState.Unmapped:
-                continue
-            if state and state[0] == window.WithdrawnState:
-                item.unmap()
-                continue
-            self.qtile.manage(item)
+        try:
+            managed = []
+            for item in children:
+                try:
+                    attrs = item.get_attributes()
+                    state = item.get_wm_state()
+                except (xcffib.xproto.WindowError, xcffib.xproto.AccessError):
+                    continue
+
+                if attrs and attrs.map_state == xcffib.xproto.MapState.Unmapped:
+                    continue
+                if attrs and attrs.override_redirect:
+                    continue
+                if state and state[0] == window.WithdrawnState:
+                    item.unmap()
+                    continue
+                managed.append(item)
+
+            for item in managed:
+                # as in Qtile._manage, changes after the snapshot are notified
+                item.set_attribute(eventmask=window.Window._window_mask)
+                item.take_snapshot()
+            for item in managed:
+                self.qtile.manage(item)
+        finally:
+            for item in children:
+                item.release_snapshot()
+
+        logger.info(
+            "Scanned %d existing windows in %.3fs", len(children), time.monotonic() - start
+        )
 
     def convert_selection(self, selection_atom, _type="UTF8_STRING") -> None:
         type_atom = self.conn.atoms[_type]
@@ -250,148 +406,240 @@ class Core(base.Core):
         )
 
     def _xpoll(self) -> None:
-        """Poll the connection and dispatch incoming events"""
+        """Poll the connection and dispatch incoming events
+
+        The queue is drained before dispatching anything, so that redundant
+        events in the batch can be collapsed first.
+        """
         assert self.qtile is not None
 
+        while True:
+            events = self._drain_events()
+            if not events:
+                break
+
+            self._events_received += len(events)
+            if self.coalesce_events and len(events) > 1:
+                events = coalesce_events(events, self._events_dropped)
+
+            dispatch_table = self._dispatch_table
+            windows_map = self.qtile.windows_map
+            for event in events:
+                try:
+                    dispatch = dispatch_table.get(event.__class__) or \
+                        self._add_dispatch(event)
+                    event_type, get_wid, core_handler, handler = dispatch
+                    logger.debug(event_type)
+
+                    # The event is passed to the window handler first, and
+                    # then to the core handler, unless the window handler
+                    # returns False or None.
+                    target = None
+                    if get_wid is not None:
+                        win = windows_map.get(get_wid(event))
+                        if win is not None:
+                            target = getattr(win, handler, None)
+                    if target is not None:
+                        logger.debug("Handling: %s", event_type)
+                        if not target(event):
+                            continue
+                    if core_handler is not None:
+                        logger.debug("Handling: %s", event_type)
+                        core_handler(event)
+                    elif target is None:
+                        logger.info("Unhandled event: %s", event_type)
+                except _IGNORED_ERRORS:
+                    pass
+                except Exception:
+                    if self._check_connection():
+                        return
+                    logger.exception("Got an exception in poll loop")
+        self.conn.flush()
+
+    def _drain_events(self) -> List:
+        """Read all of the events currently queued on the connection
+
+        The time of the events is recorded as the latest server time, see
+        get_valid_timestamp.
+        """
+        conn = self.conn
+        probe_wid = conn.timestamp_window.wid if conn.timestamp_window is not None else None
+        events = []
         while True:
             try:
                 event = self.conn.conn.poll_for_event()
                 if not event:
                     break
-
-                if event.__class__ in _IGNORED_EVENTS:
-                    continue
-
-                event_type = event.__class__.__name__
-                if event_type.endswith("Event"):
-                    event_type = event_type[:-5]
-
-                logger.debug(event_type)
-
-                for target in self._get_target_chain(event_type, event):
-                    logger.debug("Handling: {event_type}".format(event_type=event_type))
-                    ret = target(event)
-                    if not ret:
-                        break
-
-            # Catch some bad X exceptions. Since X is event based, race
-            # conditions can occur almost anywhere in the code. For example, if
-            # a window is created and then immediately destroyed (before the
-            # event handler is evoked), when the event handler tries to examine
-            # the window properties, it will throw a WindowError exception. We
-            # can essentially ignore it, since the window is already dead and
-            # we've got another event in the queue notifying us to clean it up.
-            except (
-                xcffib.xproto.WindowError,
-                xcffib.xproto.AccessError,
-                xcffib.xproto.DrawableError,
-                xcffib.xproto.GContextError,
-                xcffib.xproto.PixmapError,
-                xcffib.render.PictureError,
-            ):
-                pass
+            except _IGNORED_ERRORS:
+                continue
             except Exception:
-                error_code = self.conn.conn.has_error()
-                if error_code:
-                    error_string = xcbq.XCB_CONN_ERRORS[error_code]
-                    logger.exception(
-                        "Shutting down due to X connection error {error_string} ({error_code})".format(
-                            error_string=error_string, error_code=error_code
-                        )
-                    )
-                    self.remove_listener()
-                    self.qtile.stop()
-                    return
+                if self._check_connection():
+                    return []
                 logger.exception("Got an exception in poll loop")
-        self.conn.flush()
+                continue
+
+            if event.__class__ is xcffib.xproto.PropertyNotifyEvent and \
+                    event.window == probe_wid:
+                conn.timestamp_probes -= 1
+                if not conn.timestamp_probes:
+                    conn.timestamp = event.time
+                continue
+            if not conn.timestamp_probes:
+                conn.timestamp = getattr(event, "time", 0) or conn.timestamp
+
+            if event.__class__ in _IGNORED_EVENTS:
+                continue
+            if event.__class__ is xcffib.xproto.PropertyNotifyEvent:
+                # drop stale cached values before any handler can read them
+                win = self.qtile.windows_map.get(event.window)
+                if win is not None:
+                    win.window.invalidate_property(event.atom)
+            events.append(event)
+        return events
+
+    def _check_connection(self) -> bool:
+        """Stop qtile if the X connection failed, returning True if so"""
+        assert self.qtile is not None
 
-    def _get_target_chain(self, event_type: str, event) -> List[Callable]:
-        """Returns a chain of targets that can handle this event
+        error_code = self.conn.conn.has_error()
+        if not error_code:
+            return False
 
-        Finds functions named `handle_X`, either on the window object itself or
-        on the Qtile instance, where X is the event name (e.g.  EnterNotify,
-        ConfigureNotify, etc).
+        error_string = xcbq.XCB_CONN_ERRORS[error_code]
+        logger.exception(
+            "Shutting down due to X connection error {error_string} ({error_code})".format(
+                error_string=error_string, error_code=error_code
+            )
+        )
+        self.remove_listener()
+        self.qtile.stop()
+        return True
+
+    def event_stats(self) -> Dict:
+        """Counters of the events received and collapsed by the poll loop"""
+        return dict(
+            coalesce_events=self.coalesce_events,
+            received=self._events_received,
+            dropped=sum(self._events_dropped.values()),
+            dropped_by_type=dict(self._events_dropped),
+        )
 
-        The event will be passed to each target in turn for handling, until one
-        of the handlers returns False or None, or the end of the chain is
-        reached.
-        """
+    def property_cache_stats(self) -> Dict:
+        """Counters of the window property cache"""
         assert self.qtile is not None
 
-        handler = "handle_{event_type}".format(event_type=event_type)
-        # Certain events expose the affected window id as an "event" attribute.
-        event_events = [
-            "EnterNotify",
-            "LeaveNotify",
-            "MotionNotify",
-            "ButtonPress",
-            "ButtonRelease",
-            "KeyPress",
+        cached = [
+            win.window.property_cache
+            for win in self.qtile.windows_map.values()
+            if win.window.property_cache is not None
         ]
+        return dict(
+            hits=self.conn.property_cache_hits,
+            misses=self.conn.property_cache_misses,
+            windows=len(cached),
+            entries=sum(len(cache) for cache in cached),
+        )
+
+    def _add_dispatch(self, event) -> DispatchEntry:
+        """Build and store the dispatch entry for the class of the given event
+
+        Handlers are functions named `handle_X`, either on the window object
+        itself or on the Core instance, where X is the event name (e.g.
+        EnterNotify, ConfigureNotify, etc). The window handler is looked up by
+        name on every event, as windows may swap their handlers at runtime
+        (e.g. when a bar widget grabs the keyboard), but everything else is
+        resolved once per event class.
+        """
+        event_type = event.__class__.__name__
+        if event_type.endswith("Event"):
+            event_type = event_type[:-5]
+
         if hasattr(event, "window"):
-            window = self.qtile.windows_map.get(event.window)
+            get_wid = operator.attrgetter("window")  # type: Optional[Callable]
         elif hasattr(event, "drawable"):
-            window = self.qtile.windows_map.get(event.drawable)
-        elif event_type in event_events:
-            window = self.qtile.windows_map.get(event.event)
+            get_wid = operator.attrgetter("drawable")
+        elif event_type in _WINDOW_EVENT_TYPES:
+            get_wid = operator.attrgetter("event")
         else:
-            window = None
+            get_wid = None
 
-        chain = []
-        if window is not None and hasattr(window, handler):
-            chain.append(getattr(window, handler))
-
-        if hasattr(self, handler):
-            chain.append(getattr(self, handler))
+        handler = "handle_{event_type}".format(event_type=event_type)
+        core_handler = getattr(self, handler, None)
 
-        if not chain:
-            logger.info("Unhandled event: {event_type}".format(event_type=event_type))
-        return chain
+        dispatch = (event_type, get_wid, core_handler, handler)
+        self._dispatch_table[event.__class__] = dispatch
+        return dispatch
 
     def get_valid_timestamp(self):
         """Get a valid timestamp, i.e. not CurrentTime, for X server.
 
-        It may be used in cases where CurrentTime is unacceptable for X server."""
+        It may be used in cases where CurrentTime is unacceptable for X server.
+        This is the time of the latest event received, unless the focus was
+        changed with CurrentTime since; the server is then asked for the time.
+        """
+        if self.conn.timestamp:
+            return self.conn.timestamp
+
         # do a zero length append to get the time offset as suggested by ICCCM
         # https://tronche.com/gui/x/icccm/sec-2.html#s-2.1
         # we do this on a separate connection since we can't receive events
         # without returning control to the event loop, which we can't do
         # because the event loop (via some window event) wants to know the
-        # current time.
-        conn = None
-        try:
-            conn = xcbq.Connection(self._display_name)
-            conn.default_screen.root.set_attribute(
-                eventmask=xcffib.xproto.EventMask.PropertyChange
+        # current time. The connection is kept for the next time.
+        self.conn.flush()
+        if self._timestamp_conn is None:
+            conn = xcffib.connect(display=self._display_name)
+            wid = conn.generate_id()
+            conn.core.CreateWindow(
+                0,  # CopyFromParent
+                wid,
+                self._root.wid,
+                -1, -1, 1, 1, 0,
+                xcffib.xproto.WindowClass.InputOnly,
+                0,  # CopyFromParent
+                xcffib.xproto.CW.EventMask,
+                [xcffib.xproto.EventMask.PropertyChange],
             )
-            conn.conn.core.ChangePropertyChecked(
+            self._timestamp_conn, self._timestamp_wid = conn, wid
+        conn = self._timestamp_conn
+        try:
+            conn.core.ChangePropertyChecked(
                 xcffib.xproto.PropMode.Append,
-                self._root.wid,
-                self.conn.atoms["WM_CLASS"],
-                self.conn.atoms["STRING"],
+                self._timestamp_wid,
+                xcffib.xproto.Atom.WM_CLASS,
+                xcffib.xproto.Atom.STRING,
                 8,
                 0,
                 "",
             ).check()
             while True:
-                event = conn.conn.wait_for_event()
+                event = conn.wait_for_event()
                 if event.__class__ != xcffib.xproto.PropertyNotifyEvent:
                     continue
                 return event.time
-        finally:
-            if conn is not None:
-                conn.finalize()
+        except Exception:
+            conn.disconnect()
+            self._timestamp_conn = None
+            raise
 
     @property
     def display_name(self) -> str:
         """The name of the connected display"""
         return self._display_name
 
-    def update_client_list(self, windows) -> None:
-        """Set the current clients to the given list of windows"""
-        self._root.set_property("_NET_CLIENT_LIST", windows)
-        # TODO: check stack order
-        self._root.set_property("_NET_CLIENT_LIST_STACKING", windows)
+    def update_client_list(self, windows: List[int], append: bool = False) -> None:
+        """Set the current clients to the given list of windows, in mapping order
+
+        If append is True, the windows are added to the end of the list.
+        """
+        self._root.set_property("_NET_CLIENT_LIST", windows, append=append)
+
+    def update_client_stacking(self, windows: List[int], append: bool = False) -> None:
+        """Set the stacking order of the clients, from bottom to top
+
+        If append is True, the windows are added on top of the others.
+        """
+        self._root.set_property("_NET_CLIENT_LIST_STACKING", windows, append=append)
 
     def update_net_desktops(self, groups, index: int) -> None:
         """Set the current desktops of the window manager
@@ -469,8 +717,8 @@ class Core(base.Core):
         """Ungrab the focus for pointer events"""
         self.conn.conn.core.UngrabPointer(xcffib.xproto.Atom._None)
 
-    def grab_button(self, mouse: config.Mouse) -> None:
-        """Grab the given mouse button for events"""
+    def grab_button(self, mouse: config.Mouse) -> int:
+        """Grab the given mouse button for events, returning the modifier mask"""
         try:
             modmask = xcbq.translate_masks(mouse.modifiers)
         except xcbq.XCBQError as err:
@@ -499,6 +747,7 @@ class Core(base.Core):
                 mouse.button_code,
                 modmask | amask,
             )
+        return modmask & self._valid_mask
 
     def ungrab_buttons(self) -> None:
         """Un-grab all mouse events"""
@@ -184,6 +184,9 @@ PropertyMap = {
 for _name in net_wm_states:
     PropertyMap[_name] = ('ATOM', 32)
 
+# Properties too large to keep in the property cache, read once per change
+UncachedProperties = {"_NET_WM_ICON"}
+
 # TODO add everything required here:
 # http://standards.freedesktop.org/wm-spec/latest/ar01s03.html
 SUPPORTED_ATOMS = [
@@ -379,6 +382,18 @@ class RandR:
             crtc_list.append(crtc_dict)
         return crtc_list
 
+    def query_refresh_rate(self, root):
+        """The highest refresh rate of the active CRTCs in Hz, or None"""
+        resources = self.ext.GetScreenResources(root).reply()
+        modes = {mode.id: mode for mode in resources.modes}
+        rates = []
+        for crtc in resources.crtcs:
+            crtc_info = self.ext.GetCrtcInfo(crtc, xcffib.CurrentTime).reply()
+            mode = modes.get(crtc_info.mode)
+            if mode is not None and mode.htotal and mode.vtotal:
+                rates.append(mode.dot_clock / (mode.htotal * mode.vtotal))
+        return max(rates, default=None)
+
 
 class XFixes:
     selection_mask = SelectionEventMask.SetSelectionOwner | \
@@ -433,10 +448,146 @@ class NetWmState:
         return
 
 
+class WindowSnapshot:
+    """A batch of requests about a window, sent all at once
+
+    Every request is sent out when the snapshot is taken and replies are only
+    waited for when they are first needed, so reading all of the state needed
+    to manage a window costs a single round trip to the X server. While a
+    snapshot is held, Window.get_attributes, Window.get_geometry and
+    Window.get_property answer from it; properties changed through
+    Window.set_property are dropped from it.
+
+    A snapshot can start out with only some of the properties, to decide
+    whether a window is worth the rest, and be completed by request().
+    """
+    # (property, type) pairs as requested by the Window.get_* helpers
+    properties = [
+        ("QTILE_INTERNAL", "CARDINAL"),
+        ("WM_STATE", xcffib.xproto.GetPropertyType.Any),
+        ("WM_HINTS", xcffib.xproto.GetPropertyType.Any),
+        ("WM_NORMAL_HINTS", xcffib.xproto.GetPropertyType.Any),
+        ("WM_PROTOCOLS", "ATOM"),
+        ("WM_CLASS", "STRING"),
+        ("WM_WINDOW_ROLE", "STRING"),
+        ("WM_TRANSIENT_FOR", "WINDOW"),
+        ("_NET_WM_VISIBLE_NAME", "UTF8_STRING"),
+        ("_NET_WM_NAME", "UTF8_STRING"),
+        (xcffib.xproto.Atom.WM_NAME, "UTF8_STRING"),
+        (xcffib.xproto.Atom.WM_NAME, xcffib.xproto.GetPropertyType.Any),
+        ("_NET_WM_WINDOW_TYPE", "ATOM"),
+        ("_NET_WM_STATE", "ATOM"),
+        ("_NET_WM_DESKTOP", "CARDINAL"),
+        ("_NET_WM_ICON", "CARDINAL"),
+        ("_NET_WM_STRUT_PARTIAL", "CARDINAL"),
+        ("_NET_WM_STRUT", "CARDINAL"),
+    ]
+
+    def __init__(self, window, properties=None):
+        self.window = window
+        self._cookies = {}
+        self._replies = {}
+        self.request(properties)
+
+    def request(self, properties=None):
+        """Send the requests that weren't sent yet
+
+        With `properties`, a list of (property, type) pairs, only the window
+        attributes and those properties are requested, otherwise everything.
+        """
+        core = self.window.conn.conn.core
+        wid = self.window.wid
+        if "attributes" not in self:
+            self._cookies["attributes"] = core.GetWindowAttributes(wid)
+        if properties is None:
+            properties = self.properties
+            if "geometry" not in self:
+                self._cookies["geometry"] = core.GetGeometry(wid)
+        for prop, type in properties:
+            key = self.window._property_atoms(prop, type)
+            if key not in self:
+                self._cookies[key] = core.GetProperty(
+                    False, wid, key[0], key[1], 0, (2 ** 32) - 1
+                )
+
+    def __contains__(self, key):
+        return key in self._cookies or key in self._replies
+
+    def reply(self, key):
+        """Return the reply to one of the requests
+
+        X errors are raised just like the equivalent Window.get_* call would,
+        every time the reply is asked for.
+        """
+        if key not in self._replies:
+            cookie = self._cookies.pop(key)
+            try:
+                self._replies[key] = (cookie.reply(), None)
+            except xcffib.Error as e:
+                self._replies[key] = (None, e)
+        reply, error = self._replies[key]
+        if error is not None:
+            raise error
+        return reply
+
+    def discard_property(self, prop):
+        """Forget everything known about the property with atom `prop`"""
+        for key in list(self._cookies):
+            if isinstance(key, tuple) and key[0] == prop:
+                self._cookies.pop(key).discard_reply()
+        for key in list(self._replies):
+            if isinstance(key, tuple) and key[0] == prop:
+                del self._replies[key]
+
+    def release(self):
+        """Discard the replies that were never waited for"""
+        for cookie in self._cookies.values():
+            cookie.discard_reply()
+        self._cookies.clear()
+        self._replies.clear()
+
+
 class Window:
     def __init__(self, conn, wid):
         self.conn = conn
         self.wid = wid
+        self.snapshot = None
+        self.property_cache = None
+
+    def take_snapshot(self, properties=None):
+        """Request everything needed to manage this window in one go
+
+        See WindowSnapshot; `properties` limits the properties requested. The
+        snapshot is held until release_snapshot() is called; taking a snapshot
+        while one is held adds the requests missing from it.
+        """
+        if self.snapshot is None:
+            self.snapshot = WindowSnapshot(self, properties)
+        else:
+            self.snapshot.request(properties)
+        return self.snapshot
+
+    def release_snapshot(self):
+        if self.snapshot is not None:
+            self.snapshot.release()
+            self.snapshot = None
+
+    def enable_property_cache(self):
+        """Serve get_property from replies already received
+
+        Only safe if PropertyChange events are selected on the window and
+        every PropertyNotify for it is passed to invalidate_property. The
+        properties in UncachedProperties are always read from the server.
+        """
+        if self.property_cache is None:
+            self.property_cache = {}
+
+    def invalidate_property(self, prop):
+        """Drop the cached replies for the property with atom `prop`"""
+        cache = self.property_cache
+        if cache:
+            for key in [key for key in cache if key[0] == prop]:
+                del cache[key]
 
     def _property_string(self, r):
         """Extract a string from a window property reply message"""
@@ -457,6 +608,7 @@ class Window:
             self.wid,
             xcffib.xproto.Time.CurrentTime
         )
+        self.conn.expire_timestamp()
 
     def warp_pointer(self, x, y):
         """Warps the pointer to the location `x`, `y` on the window"""
@@ -581,6 +733,8 @@ class Window:
             return self._property_utf8(r)
 
     def get_geometry(self):
+        if self.snapshot is not None and "geometry" in self.snapshot:
+            return self.snapshot.reply("geometry")
         q = self.conn.conn.core.GetGeometry(self.wid)
         return q.reply()
 
@@ -635,13 +789,21 @@ class Window:
             self.wid, mask, values
         )
 
-    def set_property(self, name, value, type=None, format=None):
+    def set_property(self, name, value, type=None, format=None, checked=False,
+                     append=False):
         """
+        By default, the request is only queued: errors are received later
+        among the events, where the poll loop handles them. A checked request
+        waits for the server to process it instead, ignoring window errors.
+
         Parameters
         ==========
         name : String Atom name
         type : String Atom name
         format : 8, 16, 32
+        checked : bool
+        append : bool
+            add the value to the end of the property instead of replacing it
         """
         if name in PropertyMap:
             if type or format:
@@ -670,27 +832,31 @@ class Window:
             # wrap it.
             value = [value]
 
+        if self.snapshot is not None:
+            self.snapshot.discard_property(self.conn.atoms[name])
+        self.invalidate_property(self.conn.atoms[name])
+
+        args = (
+            xcffib.xproto.PropMode.Append if append else xcffib.xproto.PropMode.Replace,
+            self.wid,
+            self.conn.atoms[name],
+            self.conn.atoms[type],
+            format,  # Format - 8, 16, 32
+            len(value),
+            value
+        )
+        if not checked:
+            self.conn.conn.core.ChangeProperty(*args)
+            return
         try:
-            self.conn.conn.core.ChangePropertyChecked(
-                xcffib.xproto.PropMode.Replace,
-                self.wid,
-                self.conn.atoms[name],
-                self.conn.atoms[type],
-                format,  # Format - 8, 16, 32
-                len(value),
-                value
-            ).check()
+            self.conn.conn.core.ChangePropertyChecked(*args).check()
         except xcffib.xproto.WindowError:
             logger.debug(
                 'X error in SetProperty (wid=%r, prop=%r), ignoring',
                 self.wid, name)
 
-    def get_property(self, prop, type=None, unpack=None):
-        """Return the contents of a property as a GetPropertyReply
-
-        If unpack is specified, a tuple of values is returned.  The type to
-        unpack, either `str` or `int` must be specified.
-        """
+    def _property_atoms(self, prop, type=None):
+        """Resolve a (property, type) pair of names or atoms to atoms"""
         if type is None:
             if prop not in PropertyMap:
                 raise ValueError(
@@ -699,17 +865,34 @@ class Window:
             else:
                 type, _ = PropertyMap[prop]
 
+        return (
+            self.conn.atoms[prop] if isinstance(prop, str) else prop,
+            self.conn.atoms[type] if isinstance(type, str) else type,
+        )
+
+    def get_property(self, prop, type=None, unpack=None):
+        """Return the contents of a property as a GetPropertyReply
+
+        If unpack is specified, a tuple of values is returned.  The type to
+        unpack, either `str` or `int` must be specified.
+        """
+        key = self._property_atoms(prop, type)
+        cache = self.property_cache
         try:
-            r = self.conn.conn.core.GetProperty(
-                False, self.wid,
-                self.conn.atoms[prop]
-                if isinstance(prop, str)
-                else prop,
-                self.conn.atoms[type]
-                if isinstance(type, str)
-                else type,
-                0, (2 ** 32) - 1
-            ).reply()
+            if cache is not None and key in cache:
+                self.conn.property_cache_hits += 1
+                r = cache[key]
+            elif self.snapshot is not None and key in self.snapshot:
+                # not cached: the snapshot may predate the event mask that
+                # keeps the cache up to date
+                r = self.snapshot.reply(key)
+            else:
+                r = self.conn.conn.core.GetProperty(
+                    False, self.wid, key[0], key[1], 0, (2 ** 32) - 1
+                ).reply()
+                if cache is not None and prop not in UncachedProperties:
+                    self.conn.property_cache_misses += 1
+                    cache[key] = r
         except (xcffib.xproto.WindowError, xcffib.xproto.AccessError):
             logger.debug(
                 'X error in GetProperty (wid=%r, prop=%r), ignoring',
@@ -742,6 +925,8 @@ class Window:
         self.conn.conn.core.UnmapWindowUnchecked(self.wid)
 
     def get_attributes(self):
+        if self.snapshot is not None and "attributes" in self.snapshot:
+            return self.snapshot.reply("attributes")
         return self.conn.conn.core.GetWindowAttributes(self.wid).reply()
 
     def query_tree(self):
@@ -779,6 +964,10 @@ class Connection:
             if i in self._extmap:
                 setattr(self, i, self._extmap[i](self))
 
+        self.refresh_rate = None
+        if "randr" in extensions:
+            self.refresh_rate = self.randr.query_refresh_rate(self.screens[0].root.wid)
+
         self.pseudoscreens = []
         if "xinerama" in extensions:
             for i, s in enumerate(self.xinerama.query_screens()):
@@ -802,6 +991,16 @@ class Connection:
                 self.pseudoscreens.append(scr)
 
         self.atoms = AtomCache(self)
+        self.property_cache_hits = 0
+        self.property_cache_misses = 0
+
+        # the server time of the latest event received, which requests can
+        # use instead of CurrentTime, or 0 until timestamp_probes PropertyNotify
+        # events of timestamp_window have been received. See expire_timestamp
+        # and Core.get_valid_timestamp.
+        self.timestamp = 0
+        self.timestamp_probes = 0
+        self.timestamp_window = None
 
         self.code_to_syms = {}
         self.sym_to_codes = None
@@ -879,6 +1078,30 @@ class Connection:
         )
         return Window(self, wid)
 
+    def expire_timestamp(self):
+        """Forget the time of the latest event after a request used CurrentTime
+
+        Focus changes made with CurrentTime are later than every event received
+        so far, so the times of these events can't be used to take the focus
+        anymore. A zero length append to a property is queued after the
+        request: the time of the resulting PropertyNotify, and of the events
+        received after it, are valid again.
+        """
+        if self.timestamp_window is None:
+            self.timestamp_window = self.create_window(-1, -1, 1, 1)
+            self.timestamp_window.set_attribute(eventmask=EventMask.PropertyChange)
+        self.conn.core.ChangeProperty(
+            xcffib.xproto.PropMode.Append,
+            self.timestamp_window.wid,
+            xcffib.xproto.Atom.WM_CLASS,
+            xcffib.xproto.Atom.STRING,
+            8,
+            0,
+            "",
+        )
+        self.timestamp = 0
+        self.timestamp_probes += 1
+
     def disconnect(self):
         try:
             self.conn.disconnect()
@@ -918,6 +1141,7 @@ class Connection:
                 xcffib.xproto.InputFocus.PointerRoot,
                 xcffib.xproto.Time.CurrentTime,
             )
+            self.expire_timestamp()
 
     @functools.lru_cache()
     def color_pixel(self, name):
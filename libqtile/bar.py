@@ -166,6 +166,14 @@ class Bar(Gap, configurable.Configurable):
         self.window = None
 
         self.queued_draws = 0
+        self.full_redraws = 0
+        self.partial_redraws = 0
+        # widgets whose content changed since the last draw, the whole bar is
+        # drawn again if one of the draws didn't tell which one it was for
+        self._dirty = set()
+        self._full_redraw = True
+        # (widget, offset, length) of the widgets as they were last drawn
+        self._drawn = []
 
     def _configure(self, qtile, screen):
         Gap._configure(self, qtile, screen)
@@ -202,6 +210,9 @@ class Bar(Gap, configurable.Configurable):
 
         if self.window:
             self.window.place(self.x, self.y, self.width, self.height, 0, None)
+            self.drawer.width = self.width
+            self.drawer.height = self.height
+            self.drawer.clear(self.background)
             self.crashed_widgets = []
             for i in self.widgets:
                 self._configure_widget(i)
@@ -244,6 +255,7 @@ class Bar(Gap, configurable.Configurable):
             self._remove_crashed_widgets()
 
         self._resize(self.length, self.widgets)
+        self._full_redraw = True
 
     def _configure_widget(self, widget):
         configured = True
@@ -397,7 +409,17 @@ class Bar(Gap, configurable.Configurable):
         if self.saved_focus is not None:
             self.saved_focus.window.set_input_focus()
 
-    def draw(self):
+    def draw(self, widget=None):
+        """Draw the bar at the end of the current event loop iteration
+
+        If a widget is given, only it and the widgets that it moved are drawn
+        again, the pixels of the widgets that merely slid along the bar are
+        moved instead. Otherwise the whole bar is drawn again.
+        """
+        if widget is None:
+            self._full_redraw = True
+        else:
+            self._dirty.add(widget)
         if self.queued_draws == 0:
             self.qtile.call_soon(self._actual_draw)
         self.queued_draws += 1
@@ -405,15 +427,82 @@ class Bar(Gap, configurable.Configurable):
     def _actual_draw(self):
         self.queued_draws = 0
         self._resize(self.length, self.widgets)
-        for i in self.widgets:
-            i.draw()
+
+        drawn = [(i, i.offset, i.length) for i in self.widgets]
+        previous, self._drawn = self._drawn, drawn
+        dirty, self._dirty = self._dirty, set()
+        full = self._full_redraw or len(drawn) != len(previous) or any(
+            i is not j for (i, _, _), (j, _, _) in zip(drawn, previous)
+        )
+        self._full_redraw = False
+
+        if full:
+            self.full_redraws += 1
+            for i in self.widgets:
+                i.draw()
+        else:
+            self.partial_redraws += 1
+            self._partial_draw(drawn, previous, dirty)
+
         if self.widgets:
-            end = i.offset + i.length
-            if end < self.length:
+            end = drawn[-1][1] + drawn[-1][2]
+            if end < self.length and (full or end != previous[-1][1] + previous[-1][2]):
+                if self.horizontal:
+                    area = (end, 0, self.length - end, self.height)
+                else:
+                    area = (0, end, self.width, self.length - end)
+                self.drawer.set_source_rgb(self.background)
+                self.drawer.ctx.rectangle(*area)
+                self.drawer.ctx.fill()
+                self.drawer.damage(*area)
+
+    def _partial_draw(self, drawn, previous, dirty):
+        redraw = []
+        # runs of consecutive widgets that slid along the bar by the same
+        # distance, as [old offset, new offset, length, widgets]
+        slides = []
+        for (widget, offset, length), (_, old_offset, old_length) in zip(drawn, previous):
+            if widget in dirty or length != old_length:
+                redraw.append(widget)
+            elif offset != old_offset:
+                if widget.redraw_on_move or old_offset + length > self.length:
+                    redraw.append(widget)
+                    continue
+                if slides:
+                    slide = slides[-1]
+                    if slide[0] + slide[2] == old_offset and slide[1] + slide[2] == offset:
+                        slide[2] += length
+                        slide[3].append(widget)
+                        continue
+                slides.append([old_offset, offset, length, [widget]])
+
+        if len({offset - old_offset for old_offset, offset, _, _ in slides}) > 1:
+            # Widgets slid by different distances, only the simple case of the
+            # widgets moved by a single widget changing length is handled.
+            for slide in slides:
+                redraw.extend(slide[3])
+        elif slides:
+            # Move the runs in an order that doesn't overwrite the pixels of
+            # the runs still to be moved, and before the widgets drawn again
+            # paint over them.
+            slides.sort(key=lambda slide: slide[0], reverse=slides[0][1] > slides[0][0])
+            for old_offset, offset, length, moved in slides:
                 if self.horizontal:
-                    self.drawer.draw(offsetx=end, width=self.length - end)
+                    area = (offset, 0, length, self.height)
+                    self.drawer.move(old_offset, 0, *area)
                 else:
-                    self.drawer.draw(offsety=end, height=self.length - end)
+                    area = (0, offset, self.width, length)
+                    self.drawer.move(0, old_offset, *area)
+                self.drawer.damage(*area)
+                # e.g. mirrors paint from where the widgets were drawn
+                for widget in moved:
+                    if self.horizontal:
+                        widget.drawer.shift(offset - old_offset, 0)
+                    else:
+                        widget.drawer.shift(0, offset - old_offset)
+
+        for i in redraw:
+            i.draw()
 
     def info(self):
         return dict(
@@ -423,6 +512,8 @@ class Bar(Gap, configurable.Configurable):
             height=self.height,
             position=self.position,
             widgets=[i.info() for i in self.widgets],
+            full_redraws=self.full_redraws,
+            partial_redraws=self.partial_redraws,
             window=self.window.window.wid
         )
 
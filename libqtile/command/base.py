@@ -50,6 +50,34 @@ class CommandException(Exception):
     """Error raised while executing a command"""
 
 
+def executor_safe(func: Callable) -> Callable:
+    """Mark a command as safe to run in a thread, outside of the event loop
+
+    When called over IPC, such commands run in the default executor of the
+    event loop so they don't hold up the handling of events. They must not
+    modify anything, and only read state that the event loop doesn't modify
+    while they run. Commands that need to read the state of qtile can instead
+    be coroutines taking a snapshot of it on the event loop, before awaiting
+    the slow part in an executor.
+    """
+    func.executor_safe = True  # type: ignore
+    return func
+
+
+def ipc_coroutine(coroutine: Callable) -> Callable[[Callable], Callable]:
+    """Run a command as the given coroutine method when called over IPC
+
+    The command stays synchronous wherever it is called on the event loop,
+    e.g. in batches, key bindings or through QtileCommandInterface, while IPC
+    clients get its result from the coroutine, which is called with the same
+    arguments and can await the slow part in an executor.
+    """
+    def decorator(func: Callable) -> Callable:
+        func.ipc_coroutine = coroutine  # type: ignore
+        return func
+    return decorator
+
+
 class CommandObject(metaclass=abc.ABCMeta):
     """Base class for objects that expose commands
 
@@ -22,11 +22,28 @@
 The interface to execute commands on the command graph
 """
 
+import asyncio
+import collections
+import functools
+import inspect
+import time
 import traceback
+import types
 from abc import ABCMeta, abstractmethod
-from typing import Any, Dict, List, Tuple, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from libqtile import ipc
+from libqtile import hook, ipc
 from libqtile.command.base import (
     CommandError,
     CommandException,
@@ -44,6 +61,12 @@ SUCCESS = 0
 ERROR = 1
 EXCEPTION = 2
 
+# First element of a message carrying a list of calls, see IPCCommandBatch
+BATCH = "batch"
+
+# First element of a message subscribing to hooks, see IPCHookSubscription
+SUBSCRIBE = "subscribe"
+
 
 def format_selectors(selectors: List[SelectorType]) -> str:
     """Build the path to the selected command graph node"""
@@ -283,10 +306,183 @@ class IPCCommandInterface(CommandInterface):
         _, items = self.execute(items_call, (object_type,), {})
         return items is not None and item in items
 
+    def batch(self) -> "IPCCommandBatch":
+        """Start a batch of calls to be sent in a single IPC round trip"""
+        return IPCCommandBatch(self._client)
+
+    def subscribe(self, hooks: List[str]) -> Iterator[Dict[str, Any]]:
+        """Yield the given hooks as they are fired by the running qtile
+
+        Each event is a dict with the name of the hook, its serialized
+        arguments and the number of events dropped just before it because the
+        client wasn't reading them fast enough. The subscription lasts until
+        the iterator is closed.
+
+        Parameters
+        ----------
+        hooks : list of str
+            The names of the hooks to subscribe to.
+        """
+        replies = self._client.stream((SUBSCRIBE, hooks))
+        try:
+            for status, result in replies:
+                if status != SUCCESS:
+                    raise CommandError(result)
+                # the first reply only acknowledges the subscription
+                if result is not None:
+                    yield result
+        finally:
+            replies.close()
+
+
+class IPCCommandBatch(CommandInterface):
+    """Queue command graph calls and execute them together
+
+    Calls are only queued by execute(); flush() sends all of them in a single
+    IPC message and the server runs them in order, within one turn of its
+    event loop. Commands and items can't be checked before the batch is
+    flushed, so navigating never fails; invalid calls instead get an error
+    result.
+    """
+
+    def __init__(self, ipc_client: ipc.Client):
+        """Build a batch sending its calls through the given IPC client
+
+        Parameters
+        ----------
+        ipc_client : ipc.Client
+            The client that is to be used to send the batch.
+        """
+        self._client = ipc_client
+        self._queue = []  # type: List[Tuple[List[SelectorType], str, Tuple, Dict]]
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def execute(self, call: CommandGraphCall, args: Tuple, kwargs: Dict) -> int:
+        """Queue the given call, returning its index in the flushed results"""
+        self._queue.append((call.parent.selectors, call.name, args, kwargs))
+        return len(self._queue) - 1
+
+    def has_command(self, node: CommandGraphNode, command: str) -> bool:
+        """Commands are checked by the server when the batch is flushed"""
+        return True
+
+    def has_item(self, node: CommandGraphNode, object_type: str, item: Union[str, int]) -> bool:
+        """Items are checked by the server when the batch is flushed"""
+        return True
+
+    def flush(self, return_exceptions: bool = False) -> List[Any]:
+        """Execute the queued calls, returning their results in order
+
+        Parameters
+        ----------
+        return_exceptions : bool
+            If True, failed calls have a CommandError or CommandException in
+            place of their result. Otherwise, the first failure is raised once
+            all of the calls have run.
+        """
+        calls, self._queue = self._queue, []
+        if not calls:
+            return []
+
+        status, replies = self._client.send((BATCH, calls))
+        if status != SUCCESS:
+            raise CommandException(replies)
+
+        results = []  # type: List[Any]
+        for status, result in replies:
+            if status == ERROR:
+                result = CommandError(result)
+            elif status == EXCEPTION:
+                result = CommandException(result)
+            elif status == SUCCESS:
+                results.append(result)
+                continue
+            if not return_exceptions:
+                raise result
+            results.append(result)
+        return results
+
+
+class IPCHookSubscription:
+    """Stream the hooks fired by qtile to an IPC client
+
+    Hook arguments are serialized as the hook fires and the event is queued;
+    the stream then sends the queue at the pace of the client. At most
+    max_queued events wait in the queue: when a slow client lets it fill up,
+    the oldest events are dropped rather than holding up qtile, and the next
+    event sent tells how many were lost.
+    """
+
+    max_queued = 256
+
+    def __init__(self, hooks: List[str]) -> None:
+        self.hooks = hooks
+        self._queue = collections.deque()  # type: Deque[Tuple[str, List[Any]]]
+        self._dropped = 0
+        self._ready = asyncio.Event()
+
+    def _callback(self, name: str) -> Callable:
+        def callback(*args, **kwargs):
+            self.push(name, args)
+        return callback
+
+    def push(self, name: str, args: Tuple) -> None:
+        """Queue an event for the given hook"""
+        if len(self._queue) >= self.max_queued:
+            self._queue.popleft()
+            self._dropped += 1
+        self._queue.append((name, [self.serialize(arg) for arg in args]))
+        self._ready.set()
+
+    @classmethod
+    def serialize(cls, value: Any) -> Any:
+        """Turn a hook argument into something every IPC codec can encode
+
+        Objects of the command graph are sent as their info(), anything else
+        that isn't plain data as its repr().
+        """
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [cls.serialize(v) for v in value]
+        if isinstance(value, dict):
+            return {str(k): cls.serialize(v) for k, v in value.items()}
+        info = getattr(value, "info", None)
+        if callable(info):
+            try:
+                return cls.serialize(info())
+            except Exception:
+                logger.exception("Unable to get info of hook argument %r", value)
+        return repr(value)
+
+    async def stream(self) -> AsyncIterator[Tuple[int, Any]]:
+        """Subscribe to the hooks and yield their events until closed"""
+        callbacks = [(name, self._callback(name)) for name in self.hooks]
+        for name, callback in callbacks:
+            getattr(hook.subscribe, name)(callback)
+        try:
+            yield SUCCESS, None
+            while True:
+                while not self._queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                name, args = self._queue.popleft()
+                dropped, self._dropped = self._dropped, 0
+                yield SUCCESS, dict(hook=name, args=args, dropped=dropped)
+        finally:
+            for name, callback in callbacks:
+                getattr(hook.unsubscribe, name)(callback)
+
 
 class IPCCommandServer:
     """Execute the object commands for the calls that are sent to it"""
 
+    # Commands blocking the event loop for longer than this, in seconds, are
+    # logged
+    slow_command_threshold = 0.1
+
     def __init__(self, qtile) -> None:
         """Wrapper around the ipc server for communitacing with the IPCCommandInterface
 
@@ -294,23 +490,209 @@ class IPCCommandServer:
         and from the IPCCommandInterface.
         """
         self.qtile = qtile
-
-    def call(self, data: Tuple[List[SelectorType], str, Tuple, Dict]) -> Tuple[int, Any]:
-        """Receive and parse the given data"""
-        selectors, name, args, kwargs = data
+        self._stats = {}  # type: Dict[str, Dict[str, Any]]
+        # what compiled calls learnt about the classes of the command graph:
+        # whether they select an item by default, and their commands
+        self._default_items = {}  # type: Dict[Tuple[type, str], bool]
+        self._commands = {}  # type: Dict[Tuple[type, str], Callable]
+
+    def resolve(self, selectors: List[SelectorType], name: str) -> Callable:
+        """Find the command, raising CommandError if there is none"""
         try:
             obj = self.qtile.select(selectors)
             cmd = obj.command(name)
         except SelectError as err:
             sel_string = format_selectors(selectors)
-            return ERROR, "No object {} in path '{}'".format(err.name, sel_string)
+            raise CommandError("No object {} in path '{}'".format(err.name, sel_string))
         if not cmd:
-            return ERROR, "No such command"
+            raise CommandError("No such command")
+        return cmd
+
+    def compile(
+        self, selectors: List[SelectorType], name: str
+    ) -> Callable[[Tuple, Dict], Tuple[int, Any]]:
+        """Prepare a call that is made again and again, like a key binding
+
+        Returns a function taking the args and kwargs of the call, which runs
+        it like call() does. Commands of the root object are looked up once.
+        The objects selected by default, like the current window or layout,
+        are selected again on every call but without listing all of the items
+        that could be selected, and commands are looked up once per class.
+        """
+        path = self._path(selectors, name)
+        if not selectors:
+            cmd = self.qtile.command(name)
+            if cmd:
+                return functools.partial(self._call, path, name, cmd)
+
+        def call(args: Tuple, kwargs: Dict) -> Tuple[int, Any]:
+            cmd = self._resolve_compiled(selectors, name)
+            if cmd is None:
+                # let the full resolution report the error
+                return self.call((selectors, name, args, kwargs))
+            return self._call(path, name, cmd, args, kwargs)
+
+        return call
+
+    def _resolve_compiled(self, selectors: List[SelectorType], name: str) -> Optional[Callable]:
+        """Find the command for a compiled call, or return None if there is none"""
+        obj = self.qtile
+        for sel_name, selector in selectors:
+            if selector is not None:
+                try:
+                    obj = obj.select([(sel_name, selector)])
+                except SelectError:
+                    return None
+                continue
+            key = (type(obj), sel_name)
+            default = self._default_items.get(key)
+            if default is None:
+                default = self._default_items[key] = obj.items(sel_name)[0]
+            if not default:
+                return None
+            obj = obj._select(sel_name, None)
+            if obj is None:
+                return None
+
+        key = (type(obj), name)
+        func = self._commands.get(key)
+        if func is None:
+            func = getattr(type(obj), "cmd_" + name, None)
+            if not inspect.isfunction(func):
+                # e.g. commands delegated by __getattr__
+                return obj.command(name)
+            self._commands[key] = func
+        return types.MethodType(func, obj)
+
+    def call(self, data: Tuple[List[SelectorType], str, Tuple, Dict]) -> Any:
+        """Receive and parse the given data
+
+        Commands run right away on the event loop. Coroutine commands are only
+        scheduled, their result is None.
+        """
+        if data[0] == BATCH:
+            return self.call_batch(data[1])
+        if data[0] == SUBSCRIBE:
+            return self.subscribe(data[1])
+
+        selectors, name, args, kwargs = data
+        try:
+            cmd = self.resolve(selectors, name)
+        except CommandError as err:
+            return ERROR, err.args[0]
+        return self._call(self._path(selectors, name), name, cmd, args, kwargs)
 
+    def _call(
+        self, path: str, name: str, cmd: Callable, args: Tuple, kwargs: Dict
+    ) -> Tuple[int, Any]:
+        """Run the command on the event loop"""
         logger.debug("Command: %s(%s, %s)", name, args, kwargs)
+        start = time.monotonic()
         try:
-            return SUCCESS, cmd(*args, **kwargs)
+            result = cmd(*args, **kwargs)
+            if inspect.iscoroutine(result):
+                asyncio.ensure_future(result)
+                result = None
+            return SUCCESS, result
         except CommandError as err:
             return ERROR, err.args[0]
         except Exception:
             return EXCEPTION, traceback.format_exc()
+        finally:
+            self._record(path, time.monotonic() - start, on_loop=True)
+
+    def handle(self, data: Tuple[List[SelectorType], str, Tuple, Dict]) -> Any:
+        """Receive and parse the data sent by an IPC client
+
+        Like call(), except that coroutine commands, commands with an
+        ipc_coroutine and commands marked executor_safe don't hold up the
+        event loop: they are returned as an awaitable of their result, which
+        the IPC server sends once done.
+        """
+        if data[0] in (BATCH, SUBSCRIBE):
+            return self.call(data)
+
+        selectors, name, args, kwargs = data
+        try:
+            cmd = self.resolve(selectors, name)
+        except CommandError as err:
+            return ERROR, err.args[0]
+        coroutine = getattr(cmd, "ipc_coroutine", None)
+        if coroutine is not None:
+            cmd = types.MethodType(coroutine, cmd.__self__)
+        if asyncio.iscoroutinefunction(cmd) or getattr(cmd, "executor_safe", False):
+            return self._call_async(self._path(selectors, name), name, cmd, args, kwargs)
+        return self._call(self._path(selectors, name), name, cmd, args, kwargs)
+
+    async def _call_async(
+        self, path: str, name: str, cmd: Callable, args: Tuple, kwargs: Dict
+    ) -> Tuple[int, Any]:
+        """Await a coroutine command, or run the command in an executor"""
+        logger.debug("Command: %s(%s, %s)", name, args, kwargs)
+        start = time.monotonic()
+        try:
+            if asyncio.iscoroutinefunction(cmd):
+                result = await cmd(*args, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(None, functools.partial(cmd, *args, **kwargs))
+            return SUCCESS, result
+        except CommandError as err:
+            return ERROR, err.args[0]
+        except Exception:
+            return EXCEPTION, traceback.format_exc()
+        finally:
+            self._record(path, time.monotonic() - start, on_loop=False)
+
+    @staticmethod
+    def _path(selectors: List[SelectorType], name: str) -> str:
+        """The path of a command in the command stats"""
+        return ".".join([sel_name for sel_name, _ in selectors] + [name])
+
+    def _record(self, path: str, elapsed: float, on_loop: bool) -> None:
+        """Account the execution time of a command"""
+        stats = self._stats.get(path)
+        if stats is None:
+            stats = self._stats[path] = dict(
+                calls=0, total=0.0, max=0.0, loop_total=0.0, loop_max=0.0
+            )
+        stats["calls"] += 1
+        stats["total"] += elapsed
+        stats["max"] = max(stats["max"], elapsed)
+        if on_loop:
+            stats["loop_total"] += elapsed
+            stats["loop_max"] = max(stats["loop_max"], elapsed)
+            if elapsed > self.slow_command_threshold:
+                logger.warning("Command %s blocked the event loop for %.3fs", path, elapsed)
+
+    def command_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the number of calls and execution times of every command
+
+        Commands are named after the path to their object, without selectors.
+        Times are in seconds: total and max count every call, loop_total and
+        loop_max only the calls which ran on the event loop, holding it up for
+        as long as they took.
+        """
+        return {path: dict(stats) for path, stats in self._stats.items()}
+
+    def call_batch(
+        self, calls: List[Tuple[List[SelectorType], str, Tuple, Dict]]
+    ) -> Tuple[int, List[Tuple[int, Any]]]:
+        """Execute the given calls in order, returning all of their results"""
+        results = []
+        for data in calls:
+            if data[0] == SUBSCRIBE:
+                results.append((ERROR, "Can't subscribe to hooks in a batch"))
+                continue
+            try:
+                results.append(self.call(tuple(data)))
+            except Exception:
+                results.append((EXCEPTION, traceback.format_exc()))
+        return SUCCESS, results
+
+    def subscribe(self, hooks: List[str]) -> Any:
+        """Start streaming the given hooks, see IPCHookSubscription"""
+        unknown = [name for name in hooks if name not in hook.subscribe.hooks]
+        if unknown:
+            return ERROR, "No such hooks: {}".format(", ".join(unknown))
+        return IPCHookSubscription(list(hooks)).stream()
@@ -106,8 +106,10 @@ class Mouse:
 class Drag(Mouse):
     """Defines binding of a mouse to some dragging action
 
-    On each motion event command is executed with two extra parameters added x
-    and y offset from previous move
+    On motion events command is executed with two extra parameters added x
+    and y offset from previous move. Motion events are handled at most once
+    per frame of the display, and the commands act on the objects they
+    selected when the drag started.
 
     It focuses clicked window by default.  If you want to prevent it pass,
     `focus=None` as an argument
@@ -59,6 +59,9 @@ class Config:
         ("extension_defaults", "Dict[str, Any]"),
         ("bring_front_click", "bool"),
         ("wmname", "str"),
+        ("coalesce_events", "bool"),
+        ("skip_redundant_configures", "bool"),
+        ("monitor_loop", "bool"),
     ]
 
     def __init__(self, file_path=None, **settings):
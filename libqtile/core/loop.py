@@ -1,18 +1,115 @@
 import asyncio
+import collections
 import contextlib
 import signal
-from typing import Callable, Dict, Optional
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Deque, Dict, List, Optional
 
 from libqtile.log_utils import logger
 
 
+class LoopMonitor:
+    """Measure how late the event loop runs its callbacks
+
+    A heartbeat scheduled every `interval` seconds measures how late the loop
+    runs it. A watchdog thread, polling twice per `stall_threshold`, captures
+    the stack of the thread running the loop once the heartbeat is
+    `stall_threshold` seconds late, so the code holding up the loop can be
+    found. The latest `max_stalls` stalls are kept.
+    """
+    interval = 0.5
+    stall_threshold = 0.25
+    max_stalls = 32
+
+    def __init__(self) -> None:
+        self.stalls = collections.deque(maxlen=self.max_stalls)  # type: Deque[Dict[str, Any]]
+        self.beats = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._handle = None  # type: Optional[asyncio.TimerHandle]
+        self._watchdog = None  # type: Optional[threading.Thread]
+        self._stopped = threading.Event()
+        self._thread_id = 0
+        # when the next heartbeat is due, on the monotonic clock, and the
+        # stack captured by the watchdog while the loop was stalled
+        self._due = 0.0
+        self._stack = None  # type: Optional[List[str]]
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        # a watchdog still exiting after stop() keeps the event it was given
+        self._stopped = threading.Event()
+        self._schedule()
+        self._watchdog = threading.Thread(
+            target=self._watch, args=(self._stopped,), name="qtile loop watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._watchdog is not None:
+            # the watchdog is a daemon thread that exits at its next poll,
+            # don't hold up the loop until then
+            self._watchdog.join(timeout=0.01)
+            self._watchdog = None
+
+    def _schedule(self) -> None:
+        assert self._loop is not None
+        self._due = time.monotonic() + self.interval
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _beat(self) -> None:
+        lag = max(time.monotonic() - self._due, 0.0)
+        stack, self._stack = self._stack, None
+        self.beats += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        if lag > self.stall_threshold:
+            self.stalls.append(dict(
+                time=time.time() - lag,
+                duration=lag,
+                stack=stack,
+            ))
+            logger.warning(
+                "Event loop stalled for %.3fs in:\n%s", lag, "".join(stack or ["unknown\n"])
+            )
+        self._schedule()
+
+    def _watch(self, stopped: threading.Event) -> None:
+        """Capture the stack of the loop thread when the heartbeat is late"""
+        while not stopped.wait(self.stall_threshold / 2):
+            due = self._due
+            if self._stack is None and time.monotonic() - due > self.stall_threshold:
+                frame = sys._current_frames().get(self._thread_id)
+                if frame is not None and self._due == due:
+                    self._stack = traceback.format_stack(frame)
+
+    def stats(self) -> Dict[str, Any]:
+        return dict(
+            beats=self.beats,
+            mean_lag=self.total_lag / self.beats if self.beats else 0.0,
+            max_lag=self.max_lag,
+            stalls=list(self.stalls),
+        )
+
+
 class LoopContext(contextlib.AbstractAsyncContextManager):
     def __init__(
         self,
         signals: Optional[Dict[signal.Signals, Callable]] = None,
+        monitor: Optional[LoopMonitor] = None,
     ) -> None:
         super().__init__()
         self._signals = signals or {}
+        self._monitor = monitor
         self._stopped = False
 
     async def __aenter__(self) -> 'LoopContext':
@@ -21,11 +118,15 @@ class LoopContext(contextlib.AbstractAsyncContextManager):
         loop.set_exception_handler(self._handle_exception)
         for sig, handler in self._signals.items():
             loop.add_signal_handler(sig, handler)
+        if self._monitor is not None:
+            self._monitor.start()
 
         return self
 
     async def __aexit__(self, *args) -> None:
         self._stopped = True
+        if self._monitor is not None:
+            self._monitor.stop()
 
         await self._cancel_all_tasks()
 
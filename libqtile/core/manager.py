@@ -29,29 +29,35 @@ import subprocess
 import tempfile
 import time
 import warnings
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import xcffib
 import xcffib.xinerama
 import xcffib.xproto
 
 import libqtile
-from libqtile import confreader, hook, ipc, utils, window
+from libqtile import confreader, drawer, hook, ipc, utils, window
 from libqtile.backend.x11 import xcbq
 from libqtile.command import interface
-from libqtile.command.base import CommandError, CommandException, CommandObject
+from libqtile.command.base import (
+    CommandError,
+    CommandException,
+    CommandObject,
+    executor_safe,
+    ipc_coroutine,
+)
 from libqtile.command.client import InteractiveCommandClient
 from libqtile.command.interface import IPCCommandServer, QtileCommandInterface
-from libqtile.config import Click, Drag, Key, KeyChord, Match, Rule
+from libqtile.config import Click, Drag, Key, KeyChord, Match, Mouse, Rule
 from libqtile.config import ScratchPad as ScratchPadConfig
 from libqtile.config import Screen
 from libqtile.core.lifecycle import lifecycle
-from libqtile.core.loop import LoopContext
+from libqtile.core.loop import LoopContext, LoopMonitor
 from libqtile.core.state import QtileState
 from libqtile.dgroups import DGroups
 from libqtile.extension.base import _Extension
 from libqtile.group import _Group
-from libqtile.lazy import lazy
+from libqtile.lazy import LazyCall, lazy
 from libqtile.log_utils import logger
 from libqtile.scratchpad import ScratchPad
 from libqtile.utils import get_cache_dir, send_notification
@@ -73,17 +79,35 @@ class Qtile(CommandObject):
         self._state = state
         self.socket_path = socket_path
 
-        self._drag: Optional[Drag] = None
-        self.mouse_map: Dict[int, List[Click]] = {}
+        # the button, start position and start value of the current drag, with
+        # its commands resolved when it started. Motion events are applied at
+        # most once per frame: _drag_position is the latest pending position.
+        self._drag: Optional[Tuple[int, int, int, int, int, List[Tuple[Callable, Tuple, Dict, str]]]] = None
+        self._drag_position: Optional[Tuple[int, int]] = None
+        self._drag_time = 0.
+        self._drag_scheduled = False
+        self.mouse_map: Dict[Tuple[int, int], List[Mouse]] = {}
         self.mouse_position = (0, 0)
 
         self.windows_map: Dict[int, window._Window] = {}
+        # managed clients in mapping order, and in stacking order from bottom
+        # to top, with the changes to send at the next update of the lists.
+        # The lists left by a previous instance are rewritten first.
+        self._client_list: Dict[int, None] = {}
+        self._client_stacking: Dict[int, None] = {}
+        self._top_client: Optional[int] = None
+        self._client_list_appended: List[int] = []
+        self._client_list_rewrite = True
+        self._client_stacking_rewrite = True
+        self._client_list_scheduled = False
         self.widgets_map: Dict[str, _Widget] = {}
         self.groups_map: Dict[str, _Group] = {}
         self.groups: List[_Group] = []
         self.dgroups: Optional[DGroups] = None
 
         self.keys_map: Dict[Tuple[int, int], Key] = {}
+        # the calls of the key bindings, compiled when they are grabbed
+        self._key_calls: Dict[LazyCall, Callable[[Tuple, Dict], Tuple[int, Any]]] = {}
         self.current_chord = False
         self.numlock_mask, self.valid_mask = self.core.masks
 
@@ -94,6 +118,7 @@ class Qtile(CommandObject):
 
         self._eventloop: Optional[asyncio.AbstractEventLoop] = None
         self._stopped_event: Optional[asyncio.Event] = None
+        self.loop_monitor: Optional[LoopMonitor] = None
 
         self.server = IPCCommandServer(self)
         self.config = config
@@ -142,8 +167,12 @@ class Qtile(CommandObject):
         self.config.mouse += (Click([], "Button1", lazy.function(noop), focus="after"),)
 
     def dump_state(self, buf):
+        self._pickle_state(QtileState(self), buf)
+
+    @staticmethod
+    def _pickle_state(state, buf):
         try:
-            pickle.dump(QtileState(self), buf, protocol=0)
+            pickle.dump(state, buf, protocol=0)
         except:  # noqa: E722
             logger.exception('Unable to pickle qtile state')
 
@@ -164,11 +193,6 @@ class Qtile(CommandObject):
         for key in self.config.keys:
             self.grab_key(key)
 
-        for i in self.config.mouse:
-            if self.mouse_map.get(i.button_code) is None:
-                self.mouse_map[i.button_code] = []
-            self.mouse_map[i.button_code].append(i)
-
         self.grab_mouse()
 
         # no_spawn is set when we are restarting; we only want to run the
@@ -232,14 +256,16 @@ class Qtile(CommandObject):
         self._eventloop = asyncio.get_running_loop()
         self._stopped_event = asyncio.Event()
         self.core.setup_listener(self)
+        if self.config.monitor_loop:
+            self.loop_monitor = LoopMonitor()
         try:
             async with LoopContext({
                 signal.SIGTERM: self.stop,
                 signal.SIGINT: self.stop,
                 signal.SIGHUP: self.restart,
-            }), ipc.Server(
+            }, monitor=self.loop_monitor), ipc.Server(
                 self._prepare_socket_path(self.socket_path),
-                self.server.call,
+                self.server.handle,
             ):
                 self._configure()
                 await self._stopped_event.wait()
@@ -339,9 +365,10 @@ class Qtile(CommandObject):
         else:
             for cmd in key.commands:
                 if cmd.check(self):
-                    status, val = self.server.call(
-                        (cmd.selectors, cmd.name, cmd.args, cmd.kwargs)
-                    )
+                    call = self._key_calls.get(cmd)
+                    if call is None:
+                        call = self._key_calls[cmd] = self.server.compile(cmd.selectors, cmd.name)
+                    status, val = call(cmd.args, cmd.kwargs)
                     if status in (interface.ERROR, interface.EXCEPTION):
                         logger.error("KB command error %s: %s" % (cmd.name, val))
             else:
@@ -362,6 +389,9 @@ class Qtile(CommandObject):
         """Grab the given key event"""
         keysym, mask_key = self.core.grab_key(key)
         self.keys_map[(keysym, mask_key)] = key
+        if not isinstance(key, KeyChord):
+            for cmd in key.commands:
+                self._key_calls[cmd] = self.server.compile(cmd.selectors, cmd.name)
 
     def ungrab_key(self, key: Key) -> None:
         """Ungrab a given key event"""
@@ -372,6 +402,7 @@ class Qtile(CommandObject):
         """Ungrab all key events"""
         self.core.ungrab_keys()
         self.keys_map.clear()
+        self._key_calls.clear()
 
     def grab_chord(self, chord) -> None:
         self.current_chord = chord.mode if chord.mode != "" else True
@@ -392,8 +423,10 @@ class Qtile(CommandObject):
 
     def grab_mouse(self) -> None:
         self.core.ungrab_buttons()
+        self.mouse_map.clear()
         for mouse in self.config.mouse:
-            self.core.grab_button(mouse)
+            modmask = self.core.grab_button(mouse)
+            self.mouse_map.setdefault((mouse.button_code, modmask), []).append(mouse)
 
     def update_net_desktops(self) -> None:
         try:
@@ -412,10 +445,61 @@ class Qtile(CommandObject):
         """Updates the client stack list
 
         This is needed for third party tasklists and drag and drop of tabs in
-        chrome
+        chrome. The lists are sent at most once per iteration of the event
+        loop: appended clients are sent as such, any other change rewrites the
+        list.
         """
-        windows = [wid for wid, c in self.windows_map.items() if c.group]
-        self.core.update_client_list(windows)
+        self._client_list_scheduled = False
+        appended, self._client_list_appended = self._client_list_appended, []
+        if self._client_list_rewrite:
+            self.core.update_client_list(list(self._client_list))
+        elif appended:
+            self.core.update_client_list(appended, append=True)
+        if self._client_stacking_rewrite:
+            self.core.update_client_stacking(list(self._client_stacking))
+        elif appended:
+            self.core.update_client_stacking(appended, append=True)
+        self._client_list_rewrite = False
+        self._client_stacking_rewrite = False
+
+    def _schedule_client_list(self) -> None:
+        if self._client_list_scheduled:
+            return
+        if self._eventloop is None:
+            self.update_client_list()
+            return
+        self._client_list_scheduled = True
+        self.call_soon(self.update_client_list)
+
+    def append_to_client_list(self, wid: int) -> None:
+        """Add a newly managed client on top of the client lists"""
+        self._client_list[wid] = None
+        self._client_stacking[wid] = None
+        self._top_client = wid
+        self._client_list_appended.append(wid)
+        self._schedule_client_list()
+
+    def remove_from_client_list(self, wid: int) -> None:
+        """Remove a client from the client lists, if it is there"""
+        if wid not in self._client_list:
+            return
+        del self._client_list[wid]
+        del self._client_stacking[wid]
+        if self._top_client == wid:
+            self._top_client = None
+        self._client_list_rewrite = True
+        self._client_stacking_rewrite = True
+        self._schedule_client_list()
+
+    def raise_in_client_list(self, wid: int) -> None:
+        """Move a client that was raised to the top of the stacking order"""
+        if wid == self._top_client or wid not in self._client_stacking:
+            return
+        del self._client_stacking[wid]
+        self._client_stacking[wid] = None
+        self._top_client = wid
+        self._client_stacking_rewrite = True
+        self._schedule_client_list()
 
     def add_group(self, name, layout=None, layouts=None, label=None):
         if name not in self.groups_map.keys():
@@ -509,6 +593,10 @@ class Qtile(CommandObject):
         c = self.manage(window)
         if c and (not c.group or not c.group.screen):
             return
+        if c and c.group._layout_queued:
+            # placed by a hook in a group whose layout is pending, lay it out
+            # before it is shown
+            c.group.layout_all(force=True)
         window.map()
 
     def unmap_window(self, window_id) -> None:
@@ -526,6 +614,15 @@ class Qtile(CommandObject):
         self.unmanage(window_id)
 
     def manage(self, w):
+        # the attributes decide whether the window is managed at all, the rest
+        # of what _manage() reads is then fetched in a single round trip
+        w.take_snapshot([("QTILE_INTERNAL", "CARDINAL")])
+        try:
+            return self._manage(w)
+        finally:
+            w.release_snapshot()
+
+    def _manage(self, w):
         try:
             attrs = w.get_attributes()
             internal = w.get_property("QTILE_INTERNAL")
@@ -542,6 +639,10 @@ class Qtile(CommandObject):
                     return
                 self.windows_map[w.wid] = c
             else:
+                # PropertyChange is selected before the properties are read,
+                # so that no change in between goes unnoticed
+                w.set_attribute(eventmask=window.Window._window_mask)
+                w.take_snapshot()
                 try:
                     c = window.Window(w, self)
                 except (xcffib.xproto.WindowError, xcffib.xproto.AccessError):
@@ -560,8 +661,11 @@ class Qtile(CommandObject):
                 self.windows_map[w.wid] = c
                 # Window may have been bound to a group in the hook.
                 if not c.group:
-                    self.current_screen.group.add(c, focus=c.can_steal_focus())
-                self.update_client_list()
+                    # laid out right away, as the window is mapped next
+                    self.current_screen.group.add(
+                        c, focus=c.can_steal_focus(), force_layout=True
+                    )
+                self.append_to_client_list(w.wid)
                 hook.fire("client_managed", c)
             return c
         else:
@@ -576,7 +680,7 @@ class Qtile(CommandObject):
             if getattr(c, "group", None):
                 c.group.remove(c)
             del self.windows_map[win]
-            self.update_client_list()
+            self.remove_from_client_list(win)
         if self.current_window is None:
             self.conn.fixup_focus()
 
@@ -711,6 +815,7 @@ class Qtile(CommandObject):
                 self.conn.conn.core.ConfigureWindow(
                     wid, xcffib.xproto.ConfigWindow.StackMode, [xcffib.xproto.StackMode.Above]
                 )
+                self.raise_in_client_list(wid)
 
             try:
                 if window.group.screen is not self.current_screen:
@@ -734,14 +839,11 @@ class Qtile(CommandObject):
 
     def process_button_click(self, button_code, state, x, y, event) -> None:
         self.mouse_position = (x, y)
-        for m in self.mouse_map.get(button_code, []):
-            try:
-                modmask = xcbq.translate_masks(m.modifiers)
-            except xcbq.XCBQError as e:
-                raise utils.QtileError(e)
-            if not m or modmask & self.valid_mask != state & self.valid_mask:
-                logger.info("Ignoring unknown button: %s" % button_code)
-                continue
+        bindings = self.mouse_map.get((button_code, state & self.valid_mask))
+        if not bindings:
+            logger.info("Ignoring unknown button: %s" % button_code)
+            return
+        for m in bindings:
             if isinstance(m, Click):
                 for i in m.commands:
                     if i.check(self):
@@ -771,42 +873,67 @@ class Qtile(CommandObject):
                     val = (0, 0)
                 if m.focus == "after":
                     self._focus_by_click(event)
-                self._drag = (x, y, val[0], val[1], m.commands)
+                # the drag commands keep acting on the objects they select now
+                commands = []
+                for i in m.commands:
+                    if i.check(self):
+                        try:
+                            cmd = self.server.resolve(i.selectors, i.name)
+                        except CommandError as err:
+                            logger.error(
+                                "Mouse command error %s: %s" % (i.name, err)
+                            )
+                            continue
+                        commands.append((cmd, i.args, i.kwargs, i.name))
+                self._drag = (button_code, x, y, val[0], val[1], commands)
+                self._drag_position = None
                 self.core.grab_pointer()
 
     def process_button_release(self, button_code):
-        k = self.mouse_map.get(button_code)
-        for m in k:
-            if not m:
-                logger.info(
-                    "Ignoring unknown button release: %s" % button_code
-                )
-                continue
-            if isinstance(m, Drag):
-                self._drag = None
-                self.core.ungrab_pointer()
+        if self._drag is None or self._drag[0] != button_code:
+            return
+        # apply the position the pointer was released at
+        self._drag_motion()
+        self._drag = None
+        self.core.ungrab_pointer()
 
     def process_button_motion(self, x, y):
         self.mouse_position = (x, y)
 
         if self._drag is None:
             return
-        ox, oy, rx, ry, cmd = self._drag
+        self._drag_position = (x, y)
+        if self._drag_scheduled:
+            return
+        if self._eventloop is not None:
+            delay = self._drag_time + 1 / self.core.refresh_rate - self._eventloop.time()
+            if delay > 0:
+                self._drag_scheduled = True
+                self.call_later(delay, self._drag_motion)
+                return
+        self._drag_motion()
+
+    def _drag_motion(self) -> None:
+        """Run the drag commands for the latest pointer position"""
+        self._drag_scheduled = False
+        if self._drag is None or self._drag_position is None:
+            return
+        x, y = self._drag_position
+        self._drag_position = None
+        if self._eventloop is not None:
+            self._drag_time = self._eventloop.time()
+
+        _, ox, oy, rx, ry, commands = self._drag
         dx = x - ox
         dy = y - oy
         if dx or dy:
-            for i in cmd:
-                if i.check(self):
-                    status, val = self.server.call((
-                        i.selectors,
-                        i.name,
-                        i.args + (rx + dx, ry + dy),
-                        i.kwargs
-                    ))
-                    if status in (interface.ERROR, interface.EXCEPTION):
-                        logger.error(
-                            "Mouse command error %s: %s" % (i.name, val)
-                        )
+            for cmd, args, kwargs, name in commands:
+                try:
+                    cmd(*args, rx + dx, ry + dy, **kwargs)
+                except CommandError as err:
+                    logger.error("Mouse command error %s: %s" % (name, err))
+                except Exception:
+                    logger.exception("Mouse command error %s:" % name)
 
     def warp_to_screen(self):
         if self.current_screen:
@@ -1264,6 +1391,40 @@ class Qtile(CommandObject):
             if isinstance(i, window.Internal)
         ]
 
+    def cmd_event_stats(self):
+        """Return counters of the events received and coalesced by the backend"""
+        return self.core.event_stats()
+
+    def cmd_property_cache_stats(self):
+        """Return hit and miss counters of the window property cache"""
+        return self.core.property_cache_stats()
+
+    def cmd_command_stats(self):
+        """Return the number of calls and execution times of every command"""
+        return self.server.command_stats()
+
+    def cmd_loop_stats(self):
+        """Return how late the event loop runs, with its latest stalls
+
+        Stalls are times the event loop was held up for longer than
+        `LoopMonitor.stall_threshold`, with the stack of the code that was
+        running at the time. Requires the `monitor_loop` config variable.
+        """
+        if self.loop_monitor is None:
+            raise CommandError("The event loop is not monitored, see monitor_loop")
+        return self.loop_monitor.stats()
+
+    def cmd_hook_stats(self):
+        """Return the number of calls and execution times of every hook subscriber"""
+        return hook.stats()
+
+    def cmd_text_cache_stats(self):
+        """Return hit and miss counters of the caches of text sizes and images"""
+        return dict(
+            extents=drawer.text_extents.stats(),
+            surfaces=drawer.text_surfaces.stats(),
+        )
+
     def cmd_qtile_info(self):
         """Returns a dictionary of info on the Qtile instance"""
         return {}
@@ -1506,15 +1667,27 @@ class Qtile(CommandObject):
         else:
             logger.error("Invalid position value:{0:s}".format(position))
 
-    def cmd_get_state(self):
-        """Get pickled state for restarting qtile"""
+    async def _get_state_async(self):
+        # the state is captured on the event loop, and pickled in a thread
+        state = QtileState(self)
         buf = io.BytesIO()
-        self.dump_state(buf)
+        await asyncio.get_running_loop().run_in_executor(None, self._pickle_state, state, buf)
+        return self._decode_state(buf)
+
+    @staticmethod
+    def _decode_state(buf):
         state = buf.getvalue().decode(errors="backslashreplace")
         logger.debug('State = ')
         logger.debug(''.join(state.split('\n')))
         return state
 
+    @ipc_coroutine(_get_state_async)
+    def cmd_get_state(self):
+        """Get pickled state for restarting qtile"""
+        buf = io.BytesIO()
+        self._pickle_state(QtileState(self), buf)
+        return self._decode_state(buf)
+
     def cmd_tracemalloc_toggle(self):
         """Toggle tracemalloc status
 
@@ -1527,6 +1700,7 @@ class Qtile(CommandObject):
         else:
             tracemalloc.stop()
 
+    @executor_safe
     def cmd_tracemalloc_dump(self):
         """Dump tracemalloc snapshot"""
         import tracemalloc
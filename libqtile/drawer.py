@@ -31,6 +31,7 @@
 # SOFTWARE.
 import collections
 import math
+from typing import Dict, Tuple
 
 import cairocffi
 import xcffib.xproto
@@ -38,10 +39,64 @@ import xcffib.xproto
 from libqtile import pangocffi, utils
 
 
+class TextCache:
+    """A least recently used cache of what was computed for laid out texts
+
+    Texts are keyed by everything the result depends on, e.g. the text,
+    whether it is markup, the font family and size, the width it is laid out
+    in and whether it wraps. Laying out a text again with Pango is skipped
+    when it was used recently, e.g. the digits of a clock or the names of
+    groups. The cache holds at most `size` texts.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._values = collections.OrderedDict()
+
+    def get(self, key, compute):
+        """Get the value for the key, calling compute() if it isn't cached"""
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            value = self._values[key] = compute()
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+        else:
+            self.hits += 1
+            self._values.move_to_end(key)
+        return value
+
+    def clear(self):
+        self._values.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.,
+            entries=len(self._values),
+            size=self.size,
+        )
+
+
+# the cairo patterns of gradients, by colours and height
+_gradients = {}  # type: Dict[Tuple[Tuple[str, ...], int], cairocffi.LinearGradient]
+# the pixel sizes of texts
+text_extents = TextCache(1024)
+# images of the texts drawn by layouts created with rasterize=True
+text_surfaces = TextCache(256)
+
+
 class TextLayout:
     def __init__(self, drawer, text, colour, font_family, font_size,
-                 font_shadow, wrap=True, markup=False):
+                 font_shadow, wrap=True, markup=False, rasterize=False):
         self.drawer, self.colour = drawer, colour
+        self.rasterize = rasterize
         layout = drawer.ctx.create_layout()
         layout.set_alignment(pangocffi.ALIGN_CENTER)
         if not wrap:  # pango wraps by default
@@ -52,6 +107,13 @@ class TextLayout:
         self.font_shadow = font_shadow
         self.layout = layout
         self.markup = markup
+        self.wrap = wrap
+        # what the size of the text depends on, as keys of text_extents: the
+        # font is the description it was created from, the family it was
+        # changed to and its size
+        self._font = (font_family, None, float(font_size))
+        self._layout_width = -1
+        self._pixel_size = None
         self.text = text
         self._width = None
 
@@ -64,6 +126,8 @@ class TextLayout:
 
     @text.setter
     def text(self, value):
+        self._text = value
+        self._pixel_size = None
         if self.markup:
             # pangocffi doesn't like None here, so we use "".
             if value is None:
@@ -72,26 +136,36 @@ class TextLayout:
             self.layout.set_attributes(attrlist)
         self.layout.set_text(utils.scrub_to_utf8(value))
 
+    def get_pixel_size(self):
+        if self._pixel_size is None:
+            key = (self._text, self.markup, self._font, self._layout_width, self.wrap)
+            self._pixel_size = text_extents.get(key, self.layout.get_pixel_size)
+        return self._pixel_size
+
     @property
     def width(self):
         if self._width is not None:
             return self._width
         else:
-            return self.layout.get_pixel_size()[0]
+            return self.get_pixel_size()[0]
 
     @width.setter
     def width(self, value):
         self._width = value
-        self.layout.set_width(pangocffi.units_from_double(value))
+        self._layout_width = pangocffi.units_from_double(value)
+        self._pixel_size = None
+        self.layout.set_width(self._layout_width)
 
     @width.deleter
     def width(self):
         self._width = None
+        self._layout_width = -1
+        self._pixel_size = None
         self.layout.set_width(-1)
 
     @property
     def height(self):
-        return self.layout.get_pixel_size()[1]
+        return self.get_pixel_size()[1]
 
     def fontdescription(self):
         return self.layout.get_font_description()
@@ -105,6 +179,8 @@ class TextLayout:
     def font_family(self, font):
         d = self.fontdescription()
         d.set_family(font)
+        self._font = (self._font[0], font, self._font[2])
+        self._pixel_size = None
         self.layout.set_font_description(d)
 
     @property
@@ -117,9 +193,23 @@ class TextLayout:
         d = self.fontdescription()
         d.set_size(size)
         d.set_absolute_size(pangocffi.units_from_double(size))
+        self._font = (self._font[0], self._font[1], float(size))
+        self._pixel_size = None
         self.layout.set_font_description(d)
 
     def draw(self, x, y):
+        # gradients depend on where the text is drawn, so they aren't cached
+        if self.rasterize and isinstance(self.colour, str) and \
+                (self.font_shadow is None or isinstance(self.font_shadow, str)):
+            key = (
+                self._text, self.markup, self._font, self._layout_width,
+                self.wrap, self.colour, self.font_shadow,
+            )
+            surface, margin = text_surfaces.get(key, self._rasterize)
+            self.drawer.ctx.set_source_surface(surface, x - margin, y - margin)
+            self.drawer.ctx.paint()
+            return
+
         if self.font_shadow is not None:
             self.drawer.set_source_rgb(self.font_shadow)
             self.drawer.ctx.move_to(x + 1, y + 1)
@@ -129,6 +219,28 @@ class TextLayout:
         self.drawer.ctx.move_to(x, y)
         self.drawer.ctx.show_layout(self.layout)
 
+    def _rasterize(self):
+        """Draw the text on an image, with a margin for glyphs overhanging it"""
+        width, height = self.get_pixel_size()
+        if self._width is not None:
+            width = max(width, math.ceil(self._width))
+        margin = height // 4 + 1
+        surface = cairocffi.ImageSurface(
+            cairocffi.FORMAT_ARGB32,
+            width + 2 * margin + 1,
+            height + 2 * margin + 1,
+        )
+        ctx = pangocffi.patch_cairo_context(cairocffi.Context(surface))
+        if self.font_shadow is not None:
+            ctx.set_source_rgba(*utils.rgb(self.font_shadow))
+            ctx.move_to(margin + 1, margin + 1)
+            ctx.show_layout(self.layout)
+        ctx.set_source_rgba(*utils.rgb(self.colour))
+        ctx.move_to(margin, margin)
+        ctx.show_layout(self.layout)
+        surface.flush()
+        return surface, margin
+
     def framed(self, border_width, border_color, pad_x, pad_y, highlight_color=None):
         return TextFrame(self, border_width, border_color, pad_x, pad_y, highlight_color=highlight_color)
 
@@ -203,17 +315,39 @@ class TextFrame:
         return self.layout.width + self.pad_left + self.pad_right
 
 
+def merge_areas(areas):
+    """Merge the areas, given as (x, y, width, height) tuples, that touch
+
+    Areas on the same row are merged along the X axis and areas in the same
+    column along the Y axis, so the damage of the widgets of a horizontal or a
+    vertical bar collapses to as few rectangles as possible.
+    """
+    merged = []
+    for x, y, width, height in sorted(set(areas)):
+        if merged:
+            px, py, pwidth, pheight = merged[-1]
+            if py == y and pheight == height and x <= px + pwidth:
+                merged[-1] = (px, py, max(pwidth, x + width - px), pheight)
+                continue
+            if px == x and pwidth == width and y <= py + pheight:
+                merged[-1] = (px, py, pwidth, max(pheight, y + height - py))
+                continue
+        merged.append((x, y, width, height))
+    return merged
+
+
 class Drawer:
     """ A helper class for drawing and text layout.
 
-    We have a drawer object for each widget in the bar. We stage drawing
-    operations locally in memory using a cairo RecordingSurface. The underlying
-    surface is an XCBSurface backed by a pixmap. We draw to the pixmap
-    starting at offset 0, 0, and when the time comes to display to the window
-    (on draw()), we copy the appropriate portion of the pixmap onto the window.
-    In the event that our drawing area is resized, we invalidate the underlying
-    surface and pixmap and recreate them when we need them again with the new
-    geometry.
+    We stage drawing operations locally in memory using a cairo
+    RecordingSurface. The underlying surface is an XCBSurface backed by a
+    pixmap. We draw to the pixmap starting at offset 0, 0, and when the time
+    comes to display to the window (on draw()), we copy the appropriate portion
+    of the pixmap onto the window. In the event that our drawing area is
+    resized, we invalidate the underlying surface and pixmap and recreate them
+    when we need them again with the new geometry.
+
+    The pixmap of a bar's drawer is shared by its widgets, see SharedDrawer.
     """
     def __init__(self, qtile, wid, width, height):
         self.qtile = qtile
@@ -221,6 +355,7 @@ class Drawer:
         self._surface = None
         self._pixmap = None
         self._gc = None
+        self._damage = []
 
         self.surface = None
         self.ctx = None
@@ -238,10 +373,9 @@ class Drawer:
 
     @property
     def pixmap(self):
-        if self._pixmap is None:
-            # draw here since the only use case of this function is in the
-            # systray widget which expects a filled pixmap.
-            self.draw()
+        # paint here since the only use case of this function is in the
+        # systray widget which expects a filled pixmap.
+        self._prepare()
         return self._pixmap
 
     def _create_gc(self):
@@ -398,6 +532,20 @@ class Drawer:
         height :
             the Y portion of the canvas to draw at the starting point.
         """
+        self._prepare()
+
+        # Finally, copy XCBSurface's underlying pixmap to the window.
+        self.qtile.conn.conn.core.CopyArea(
+            self._pixmap,
+            self.wid,
+            self._gc,
+            0, 0,  # srcx, srcy
+            offsetx, offsety,  # dstx, dsty
+            self.width if width is None else width,
+            self.height if height is None else height
+        )
+
+    def _prepare(self):
         # If this is our first draw, create the gc
         if self._gc is None:
             self._gc = self._create_gc()
@@ -410,16 +558,49 @@ class Drawer:
         # paint stored operations(if any) to XCBSurface
         self._paint()
 
-        # Finally, copy XCBSurface's underlying pixmap to the window.
+    def move(self, srcx, srcy, dstx, dsty, width, height):
+        """Move an area of the pixmap to another place of the pixmap"""
+        self._prepare()
+        self._surface.flush()
         self.qtile.conn.conn.core.CopyArea(
             self._pixmap,
-            self.wid,
+            self._pixmap,
             self._gc,
-            0, 0,  # srcx, srcy
-            offsetx, offsety,  # dstx, dsty
-            self.width if width is None else width,
-            self.height if height is None else height
+            srcx, srcy,
+            dstx, dsty,
+            width,
+            height
         )
+        self._surface.mark_dirty()
+
+    def damage(self, x, y, width, height):
+        """Copy an area of the pixmap to the same place on the window
+
+        The copies are deferred to the end of the current event loop iteration,
+        so the areas damaged in the meantime are copied with as few CopyArea
+        requests as possible.
+        """
+        if not self._damage:
+            self.qtile.call_soon(self._flush_damage)
+        self._damage.append((x, y, width, height))
+
+    def _flush_damage(self):
+        damage, self._damage = self._damage, []
+        # the drawer may have been finalized in the meantime
+        if self.surface is None:
+            return
+        self._prepare()
+        self._surface.flush()
+        for x, y, width, height in merge_areas(damage):
+            self.qtile.conn.conn.core.CopyArea(
+                self._pixmap,
+                self.wid,
+                self._gc,
+                x, y,  # srcx, srcy
+                x, y,  # dstx, dsty
+                width,
+                height
+            )
 
     def find_root_visual(self):
         for i in self.qtile.conn.default_screen.allowed_depths:
@@ -434,23 +615,37 @@ class Drawer:
         if type(colour) == list:
             if len(colour) == 0:
                 # defaults to black
-                self.ctx.set_source_rgba(*utils.rgb("#000000"))
+                self.ctx.set_source_rgba(0, 0, 0, 1)
             elif len(colour) == 1:
                 self.ctx.set_source_rgba(*utils.rgb(colour[0]))
             else:
-                linear = cairocffi.LinearGradient(0.0, 0.0, 0.0, self.height)
-                step_size = 1.0 / (len(colour) - 1)
-                step = 0.0
-                for c in colour:
-                    rgb_col = utils.rgb(c)
-                    if len(rgb_col) < 4:
-                        rgb_col[3] = 1
-                    linear.add_color_stop_rgba(step, *rgb_col)
-                    step += step_size
-                self.ctx.set_source(linear)
+                self.ctx.set_source(self._gradient(colour))
         else:
             self.ctx.set_source_rgba(*utils.rgb(colour))
 
+    def _gradient(self, colours):
+        # Gradients span the height of the drawer, their patterns are kept by
+        # colours and height.
+        key = (tuple(colours), self.height)
+        try:
+            linear = _gradients.get(key)
+        except TypeError:
+            # colours given as lists of components
+            key = None
+            linear = None
+        if linear is None:
+            linear = cairocffi.LinearGradient(0.0, 0.0, 0.0, self.height)
+            step_size = 1.0 / (len(colours) - 1)
+            step = 0.0
+            for c in colours:
+                linear.add_color_stop_rgba(step, *utils.rgb(c))
+                step += step_size
+            if key is not None:
+                if len(_gradients) >= 64:
+                    _gradients.clear()
+                _gradients[key] = linear
+        return linear
+
     def clear(self, colour):
         self.set_source_rgb(colour)
         self.ctx.rectangle(0, 0, self.width, self.height)
@@ -469,8 +664,10 @@ class Drawer:
         widths, heights = [], []
         for i in texts:
             sizelayout.text = i
-            widths.append(sizelayout.width)
-            heights.append(sizelayout.height)
+            width, height = sizelayout.get_pixel_size()
+            widths.append(width)
+            heights.append(height)
+        sizelayout.finalize()
         return max(widths), max(heights)
 
     # Old text layout functions, to be deprecated.
@@ -522,3 +719,78 @@ class Drawer:
         self.ctx.line_to(x2, y)
         self.ctx.set_line_width(linewidth)
         self.ctx.stroke()
+
+
+class SharedDrawer(Drawer):
+    """A drawer drawing into the pixmap of another drawer
+
+    Widgets record their drawing operations like they would with a Drawer, but
+    on draw() these are painted into the region of the bar's pixmap they were
+    given, which is then copied to the bar window along with the regions
+    damaged by the other widgets. This saves a pixmap the size of the whole bar
+    for each widget.
+    """
+    def __init__(self, backing):
+        self.backing = backing
+        self.qtile = backing.qtile
+        self.wid = backing.wid
+        self._offset = (0, 0)
+
+        self.surface = None
+        self.ctx = None
+
+        self._reset_surface()
+
+    def finalize(self):
+        self.surface.finish()
+        self.surface = None
+        self.ctx = None
+
+    @property
+    def width(self):
+        return self.backing.width
+
+    @property
+    def height(self):
+        return self.backing.height
+
+    def paint_to(self, drawer):
+        self.backing._prepare()
+        drawer.ctx.set_source_surface(self.backing._surface, -self._offset[0], -self._offset[1])
+        drawer.ctx.paint()
+
+    def shift(self, x, y):
+        """Follow what was drawn being moved by x and y on the backing drawer"""
+        self._offset = (self._offset[0] + x, self._offset[1] + y)
+
+    def draw(self, offsetx=0, offsety=0, width=None, height=None):
+        """
+        Parameters
+        ==========
+
+        offsetx :
+            the X offset to start drawing at.
+        offsety :
+            the Y offset to start drawing at.
+        width :
+            the X portion of the canvas to draw at the starting point.
+        height :
+            the Y portion of the canvas to draw at the starting point.
+        """
+        if width is None:
+            width = self.width
+        if height is None:
+            height = self.height
+
+        # paint what was drawn before the operations of this drawer
+        self.backing._prepare()
+
+        ctx = cairocffi.Context(self.backing._surface)
+        ctx.rectangle(offsetx, offsety, width, height)
+        ctx.clip()
+        ctx.set_source_surface(self.surface, offsetx, offsety)
+        ctx.paint()
+        self._reset_surface()
+
+        self._offset = (offsetx, offsety)
+        self.backing.damage(offsetx, offsety, width, height)
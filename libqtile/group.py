@@ -60,6 +60,11 @@ class _Group(CommandObject):
         self.focus_history = []
         self.screen = None
         self.current_layout = None
+        # pending layout_all, see layout_all
+        self._layout_queued = False
+        self._layout_warp = False
+        # window already given X focus by focus() ahead of the pending layout
+        self._layout_focused = None
 
     def _configure(self, layouts, floating_layout, qtile):
         self.screen = None
@@ -140,12 +145,36 @@ class _Group(CommandObject):
     def use_previous_layout(self):
         self.use_layout((self.current_layout - 1) % (len(self.layouts)))
 
-    def layout_all(self, warp=False):
+    def layout_all(self, warp=False, force=False):
         """Layout the floating layer, then the current layout.
 
         If we have have a current_window give it focus, optionally moving warp
-        to it.
+        to it. The layout is done once the current iteration of the event loop
+        is over, whatever the number of calls in the meantime, unless force is
+        True.
         """
+        if force:
+            self._layout_queued = False
+            self._layout_warp = False
+            self._layout_all(warp)
+            return
+        if not (self.screen and self.windows):
+            return
+        self._layout_warp = self._layout_warp or warp
+        if not self._layout_queued:
+            self._layout_queued = True
+            self.qtile.call_soon(self._flush_layout)
+
+    def _flush_layout(self):
+        if not self._layout_queued:
+            # done by a forced layout_all in the meantime
+            return
+        warp = self._layout_warp
+        self._layout_queued = False
+        self._layout_warp = False
+        self._layout_all(warp)
+
+    def _layout_all(self, warp):
         if self.screen and self.windows:
             with self.disable_mask(xcffib.xproto.EventMask.EnterWindow):
                 normal = [x for x in self.windows if not x.floating]
@@ -164,7 +193,17 @@ class _Group(CommandObject):
                     self.floating_layout.layout(floating, screen_rect)
                 if self.current_window and \
                         self.screen == self.qtile.current_screen:
-                    self.current_window.focus(warp)
+                    if self.current_window is self._layout_focused:
+                        # focus() gave it focus already, only warp to where
+                        # it has been laid out
+                        if warp and self.qtile.config.cursor_warp:
+                            self.current_window.window.warp_pointer(
+                                self.current_window.width // 2,
+                                self.current_window.height // 2,
+                            )
+                    else:
+                        self.current_window.focus(warp)
+        self._layout_focused = None
 
     def _set_screen(self, screen):
         """Set this group's screen to screen"""
@@ -174,7 +213,8 @@ class _Group(CommandObject):
         if self.screen:
             # move all floating guys offset to new screen
             self.floating_layout.to_screen(self, self.screen)
-            self.layout_all(warp=self.qtile.config.cursor_warp)
+            # lay the windows out before they are shown
+            self.layout_all(warp=self.qtile.config.cursor_warp, force=True)
             screen_rect = self.screen.get_rect()
             self.floating_layout.show(screen_rect)
             self.layout.show(screen_rect)
@@ -198,12 +238,12 @@ class _Group(CommandObject):
         for i in self.windows:
             i._reset_mask()
 
-    def focus(self, win, warp=True, force=False):
+    def focus(self, win, warp=True, force=False, force_layout=False):
         """Focus the given window
 
         If win is in the group, blur any windows and call ``focus`` on the
-        layout (in case it wants to track anything), fire focus_change hook and
-        invoke layout_all.
+        layout (in case it wants to track anything), give it the X input focus,
+        fire focus_change hook and invoke layout_all.
 
         Parameters
         ==========
@@ -215,6 +255,11 @@ class _Group(CommandObject):
             the user is actively using the mouse, or on full screen layouts
             where only one window is "maximized" at a time, and it doesn't make
             sense for the mouse to automatically move.
+        force :
+            Focus the window even while windows are being dragged.
+        force_layout :
+            Lay the group out right away instead of at the end of the current
+            event loop iteration, e.g. before a new window is mapped.
         """
         if self.qtile._drag and not force:
             # don't change focus while dragging windows (unless forced)
@@ -231,6 +276,17 @@ class _Group(CommandObject):
                 self.floating_layout.blur()
                 for layout in self.layouts:
                     layout.focus(win)
+            if force_layout:
+                hook.fire("focus_change")
+                self.layout_all(warp, force=True)
+                return
+            if self.screen and self.screen == self.qtile.current_screen:
+                # The X input focus moves right away, so that it has once the
+                # hook fires and commands return. The pointer is warped to the
+                # window once it is laid out. Hidden windows, e.g. the next
+                # window of a Max layout, can only be focused once shown.
+                if win.focus(False):
+                    self._layout_focused = win
             hook.fire("focus_change")
             self.layout_all(warp)
 
@@ -247,7 +303,7 @@ class _Group(CommandObject):
             screen=self.screen.index if self.screen else None
         )
 
-    def add(self, win, focus=True, force=False):
+    def add(self, win, focus=True, force=False, force_layout=False):
         hook.fire("group_window_add", self, win)
         self.windows.add(win)
         win.group = self
@@ -268,7 +324,9 @@ class _Group(CommandObject):
             for i in self.layouts:
                 i.add(win)
         if focus:
-            self.focus(win, warp=True, force=force)
+            self.focus(win, warp=True, force=force, force_layout=force_layout)
+        elif force_layout:
+            self.layout_all(force=True)
 
     def remove(self, win, force=False):
         self.windows.remove(win)
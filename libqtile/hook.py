@@ -32,17 +32,65 @@
 
 import asyncio
 import contextlib
-from typing import Dict, Set
+import logging
+from time import perf_counter
+from typing import Any, Callable, Dict, Set, Tuple
 
+import libqtile
 from libqtile import utils
 from libqtile.log_utils import logger
 
 subscriptions = {}  # type: Dict
 SKIPLOG = set()  # type: Set
 
+# Synchronous subscribers running for longer than this, in seconds, are logged
+slow_subscriber_threshold = 0.05
+
+# How the subscribers are called
+SYNC, COROUTINE_FUNCTION, COROUTINE = range(3)
+
+
+class _SubscriberStats:
+    """The calls to the subscribers of a hook with the same name"""
+    __slots__ = ("name", "calls", "total", "max")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+# The subscribers of every known hook, with how they are called, whether they
+# are debounced and their stats, as found when they subscribed. The tuples are
+# replaced when subscribers come and go, so fire() can iterate over them
+# safely.
+_dispatch = {}  # type: Dict[str, Tuple[Tuple[Callable, int, bool, _SubscriberStats], ...]]
+
+# The arguments of the pending calls to debounced subscribers
+_pending = {}  # type: Dict[Tuple[str, Callable], Tuple[Tuple, Dict]]
+
+_stats = {}  # type: Dict[Tuple[str, str], _SubscriberStats]
+
 
 def clear():
     subscriptions.clear()
+    _pending.clear()
+    _stats.clear()
+    for event in _dispatch:
+        _dispatch[event] = ()
+
+
+def debounce(func):
+    """Mark a hook subscriber to be called at most once per event loop iteration
+
+    When the hook fires several times before the subscriber is called, it is
+    only called with the arguments of the last time. This suits subscribers
+    that redraw what they show, like widgets following client_name_updated.
+    Without a running event loop, the subscriber is called right away.
+    """
+    func.debounce = True
+    return func
 
 
 class Subscribe:
@@ -57,6 +105,7 @@ class Subscribe:
         lst = subscriptions.setdefault(event, [])
         if func not in lst:
             lst.append(func)
+            _compile(event)
         return func
 
     def startup_once(self, func):
@@ -342,6 +391,7 @@ class Subscribe:
 
 
 subscribe = Subscribe()
+_dispatch.update((event, ()) for event in subscribe.hooks)
 
 
 class Unsubscribe(Subscribe):
@@ -358,6 +408,8 @@ class Unsubscribe(Subscribe):
                 "Tried to unsubscribe a hook that was not"
                 " currently subscribed"
             )
+        _pending.pop((event, func), None)
+        _compile(event)
 
 
 unsubscribe = Unsubscribe()
@@ -374,18 +426,121 @@ def _fire_async_event(co):
         asyncio.ensure_future(co)
 
 
+def _subscriber_name(func):
+    """The name of a subscriber in the stats, shared by the methods of a class"""
+    qualname = getattr(func, "__qualname__", None) or type(func).__qualname__
+    module = getattr(func, "__module__", None)
+    return "{}.{}".format(module, qualname) if module else qualname
+
+
+def _compile(event):
+    """Classify the subscribers of the given hook for fire()"""
+    subscribers = []
+    for func in subscriptions.get(event, []):
+        if asyncio.iscoroutinefunction(func):
+            kind = COROUTINE_FUNCTION
+        elif asyncio.iscoroutine(func):
+            kind = COROUTINE
+        else:
+            kind = SYNC
+        name = _subscriber_name(func)
+        stats = _stats.get((event, name))
+        if stats is None:
+            stats = _stats[(event, name)] = _SubscriberStats(name)
+        subscribers.append((func, kind, getattr(func, "debounce", False), stats))
+    _dispatch[event] = tuple(subscribers)
+
+
+def _call(event, func, kind, stats, args, kwargs):
+    start = perf_counter()
+    try:
+        if kind == SYNC:
+            func(*args, **kwargs)
+        elif kind == COROUTINE_FUNCTION:
+            _fire_async_event(func(*args, **kwargs))
+        else:
+            _fire_async_event(func)
+    except:  # noqa: E722
+        logger.exception("Error in hook %s", event)
+    elapsed = perf_counter() - start
+
+    stats.calls += 1
+    stats.total += elapsed
+    if elapsed > stats.max:
+        stats.max = elapsed
+    if elapsed > slow_subscriber_threshold and kind == SYNC:
+        _warn_slow(event, stats, elapsed)
+
+
+def _warn_slow(event, stats, elapsed):
+    logger.warning("Subscriber %s of hook %s took %.3fs", stats.name, event, elapsed)
+
+
+def _call_pending(event, func, kind, stats):
+    try:
+        args, kwargs = _pending.pop((event, func))
+    except KeyError:
+        # unsubscribed in the meantime
+        return
+    _call(event, func, kind, stats, args, kwargs)
+
+
+def _call_debounced(event, func, kind, stats, args, kwargs):
+    key = (event, func)
+    scheduled = key in _pending
+    _pending[key] = (args, kwargs)
+    if scheduled:
+        return
+
+    loop = None
+    with contextlib.suppress(RuntimeError):
+        loop = asyncio.get_running_loop()
+
+    if loop is None:
+        _call_pending(event, func, kind, stats)
+    elif libqtile.qtile is not None:
+        libqtile.qtile.call_soon(_call_pending, event, func, kind, stats)
+    else:
+        loop.call_soon(_call_pending, event, func, kind, stats)
+
+
 def fire(event, *args, **kwargs):
-    if event not in subscribe.hooks:
-        raise utils.QtileError("Unknown event: %s" % event)
-    if event not in SKIPLOG:
+    try:
+        subscribers = _dispatch[event]
+    except KeyError:
+        raise utils.QtileError("Unknown event: %s" % event) from None
+    if event not in SKIPLOG and logger.isEnabledFor(logging.DEBUG):
         logger.debug("Internal event: %s(%s, %s)", event, args, kwargs)
-    for i in subscriptions.get(event, []):
-        try:
-            if asyncio.iscoroutinefunction(i):
-                _fire_async_event(i(*args, **kwargs))
-            elif asyncio.iscoroutine(i):
-                _fire_async_event(i)
-            else:
-                i(*args, **kwargs)
-        except:  # noqa: E722
-            logger.exception("Error in hook %s", event)
+    for func, kind, debounced, stats in subscribers:
+        if debounced:
+            _call_debounced(event, func, kind, stats, args, kwargs)
+        elif kind != SYNC:
+            _call(event, func, kind, stats, args, kwargs)
+        else:
+            # the same as _call, for the most common subscribers
+            start = perf_counter()
+            try:
+                func(*args, **kwargs)
+            except:  # noqa: E722
+                logger.exception("Error in hook %s", event)
+            elapsed = perf_counter() - start
+            stats.calls += 1
+            stats.total += elapsed
+            if elapsed > stats.max:
+                stats.max = elapsed
+            if elapsed > slow_subscriber_threshold:
+                _warn_slow(event, stats, elapsed)
+
+
+def stats():
+    """Return the number of calls and execution times of the hook subscribers
+
+    Subscribers are named after their function, so the stats of the
+    subscribers of a hook with the same method are added up.
+    """
+    result = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
+    for (event, name), entry in _stats.items():
+        result.setdefault(event, {})[name] = dict(
+            calls=entry.calls, total=entry.total, max=entry.max
+        )
+    return result
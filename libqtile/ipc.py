@@ -19,19 +19,38 @@
 # SOFTWARE.
 
 """
-    A simple IPC mechanism for communicating between two local processes. We
-    use marshal to serialize data - this means that both client and server must
-    run the same Python version, and that clients must be trusted (as
-    un-marshalling untrusted data can result in arbitrary code execution).
+    A simple IPC mechanism for communicating between two local processes. By
+    default we use marshal to serialize data - this means that both client and
+    server must run the same Python version, and that clients must be trusted
+    (as un-marshalling untrusted data can result in arbitrary code execution).
+    Clients can instead use json, or a compact msgpack-like binary format which
+    doesn't depend on the Python version.
+
+    Connections open with a preamble carrying the protocol version, after
+    which every message is framed with the codec it is encoded with and a
+    request id. Clients either connect once per message, or keep a persistent
+    connection open for many messages. Unframed messages from older clients
+    are still understood.
 """
 import asyncio
 import fcntl
+import inspect
 import json
 import marshal
 import os.path
 import socket
 import struct
-from typing import Any, Optional, Tuple
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from libqtile.log_utils import logger
 from libqtile.utils import get_cache_dir
@@ -39,6 +58,19 @@ from libqtile.utils import get_cache_dir
 HDRFORMAT = "!L"
 HDRLEN = struct.calcsize(HDRFORMAT)
 
+# Connections open with this preamble followed by the protocol version byte.
+# It can't be mistaken for an unframed message: json text never starts with
+# 0xff, and neither does the length header of a marshalled message below 4GiB.
+PREAMBLE = b"\xffqtl"
+PROTOCOL_VERSION = 1
+
+# Every message is then framed as (codec, request id, length)
+FRAMEFORMAT = "!BLL"
+FRAMELEN = struct.calcsize(FRAMEFORMAT)
+CODEC_JSON = 1
+CODEC_MARSHAL = 2
+CODEC_BINARY = 3
+
 SOCKBASE = "qtilesocket.%s"
 
 
@@ -55,6 +87,232 @@ class IPCError(Exception):
     pass
 
 
+_BINARY_FIXINTS = [struct.pack("!B", i) for i in range(0x80)]
+_BINARY_CONSTANTS = {0xc0: None, 0xc2: False, 0xc3: True}
+# struct of the fixed size values, by type byte
+_BINARY_SCALARS = {
+    code: struct.Struct(fmt) for code, fmt in [
+        (0xcc, "!B"), (0xcd, "!H"), (0xce, "!L"), (0xcf, "!Q"),
+        (0xd0, "!b"), (0xd1, "!h"), (0xd2, "!l"), (0xd3, "!q"),
+        (0xca, "!f"), (0xcb, "!d"),
+    ]
+}
+# struct of the length of the variable sized values, by type byte
+_BINARY_LENGTHS = {
+    code: struct.Struct(fmt) for code, fmt in [
+        (0xd9, "!B"), (0xda, "!H"), (0xdb, "!L"),  # str
+        (0xc4, "!B"), (0xc5, "!H"), (0xc6, "!L"),  # bin
+        (0xdc, "!H"), (0xdd, "!L"),  # array
+        (0xde, "!H"), (0xdf, "!L"),  # map
+    ]
+}
+
+
+def _binary_int(value: int) -> bytes:
+    if 0 <= value < 0x80:
+        return _BINARY_FIXINTS[value]
+    if -0x20 <= value < 0:
+        return struct.pack("!b", value)
+    if 0 <= value <= 0xffffffffffffffff:
+        if value <= 0xff:
+            return struct.pack("!BB", 0xcc, value)
+        if value <= 0xffff:
+            return struct.pack("!BH", 0xcd, value)
+        if value <= 0xffffffff:
+            return struct.pack("!BL", 0xce, value)
+        return struct.pack("!BQ", 0xcf, value)
+    if -0x8000000000000000 <= value < 0:
+        if value >= -0x80:
+            return struct.pack("!Bb", 0xd0, value)
+        if value >= -0x8000:
+            return struct.pack("!Bh", 0xd1, value)
+        if value >= -0x80000000:
+            return struct.pack("!Bl", 0xd2, value)
+        return struct.pack("!Bq", 0xd3, value)
+    raise IPCError("Integer out of range: {}".format(value))
+
+
+def _binary_sized(data: bytes, fixcode: Optional[int], codes: Tuple[int, int, int]) -> bytes:
+    """Prefix str or bin data with its type byte and length"""
+    size = len(data)
+    if fixcode is not None and size < 0x20:
+        return struct.pack("!B", fixcode | size) + data
+    if size <= 0xff:
+        return struct.pack("!BB", codes[0], size) + data
+    if size <= 0xffff:
+        return struct.pack("!BH", codes[1], size) + data
+    return struct.pack("!BL", codes[2], size) + data
+
+
+def _binary_header(size: int, fixcode: int, code16: int, code32: int) -> bytes:
+    """The type byte and length of an array or map"""
+    if size < 0x10:
+        return struct.pack("!B", fixcode | size)
+    if size <= 0xffff:
+        return struct.pack("!BH", code16, size)
+    return struct.pack("!BL", code32, size)
+
+
+def dumps_binary(obj: Any) -> bytes:
+    """Encode the object in the msgpack-like binary format
+
+    The encoding is msgpack for None, bools, ints, floats, strings, bytes,
+    lists and dicts. Tuples are arrays prefixed with 0xc1, a byte which msgpack
+    never uses, and sets are encoded as plain arrays.
+    """
+    out = []  # type: List[bytes]
+    append = out.append
+    # replies repeat the same dict keys over and over, encode them only once
+    strings = {}  # type: Dict[str, bytes]
+
+    def pack(obj: Any) -> None:
+        kind = type(obj)
+        if kind is str:
+            data = strings.get(obj)
+            if data is None:
+                data = strings[obj] = _binary_sized(obj.encode(), 0xa0, (0xd9, 0xda, 0xdb))
+            append(data)
+        elif kind is int:
+            append(_binary_int(obj))
+        elif kind is dict:
+            append(_binary_header(len(obj), 0x80, 0xde, 0xdf))
+            for key, value in obj.items():
+                # most keys are strings, look them up without a call
+                data = strings.get(key) if type(key) is str else None
+                if data is None:
+                    pack(key)
+                else:
+                    append(data)
+                pack(value)
+        elif kind is list:
+            append(_binary_header(len(obj), 0x90, 0xdc, 0xdd))
+            for item in obj:
+                pack(item)
+        elif obj is None:
+            append(b"\xc0")
+        elif kind is bool:
+            append(b"\xc3" if obj else b"\xc2")
+        elif kind is float:
+            append(struct.pack("!Bd", 0xcb, obj))
+        elif isinstance(obj, (bytes, bytearray)):
+            append(_binary_sized(bytes(obj), None, (0xc4, 0xc5, 0xc6)))
+        elif isinstance(obj, tuple):
+            # 0xc1 is never used by msgpack, it marks the array as a tuple
+            append(b"\xc1")
+            pack(list(obj))
+        elif isinstance(obj, (list, set, frozenset)):
+            pack(list(obj))
+        elif isinstance(obj, dict):
+            pack(dict(obj))
+        elif isinstance(obj, str):
+            pack(str(obj))
+        elif isinstance(obj, int):
+            pack(int(obj))
+        elif isinstance(obj, float):
+            pack(float(obj))
+        else:
+            raise IPCError("Unable to encode {!r}".format(kind))
+
+    pack(obj)
+    return b"".join(out)
+
+
+def loads_binary(data: bytes) -> Any:
+    """Decode an object encoded by dumps_binary"""
+    size = len(data)
+
+    def unpack(offset: int) -> Tuple[Any, int]:
+        code = data[offset]
+        offset += 1
+        if code < 0x80:
+            return code, offset
+        if code >= 0xe0:
+            return code - 0x100, offset
+        if code <= 0x8f:
+            return unpack_map(code & 0x0f, offset)
+        if code <= 0x9f:
+            return unpack_array(code & 0x0f, offset)
+        if code <= 0xbf:
+            end = offset + (code & 0x1f)
+            if end > size:
+                raise IPCError("Truncated string")
+            return data[offset:end].decode(), end
+        if code in _BINARY_CONSTANTS:
+            return _BINARY_CONSTANTS[code], offset
+        if code in _BINARY_SCALARS:
+            scalar = _BINARY_SCALARS[code]
+            return scalar.unpack_from(data, offset)[0], offset + scalar.size
+        if code == 0xc1:
+            if offset >= size or not (0x90 <= data[offset] <= 0x9f or data[offset] in (0xdc, 0xdd)):
+                raise IPCError("Tuple marker not followed by an array")
+            value, offset = unpack(offset)
+            return tuple(value), offset
+        if code not in _BINARY_LENGTHS:
+            raise IPCError("Unknown type byte: {:#x}".format(code))
+
+        header = _BINARY_LENGTHS[code]
+        length = header.unpack_from(data, offset)[0]
+        offset += header.size
+        if code >= 0xde:
+            return unpack_map(length, offset)
+        if code >= 0xdc:
+            return unpack_array(length, offset)
+        if code >= 0xd9:
+            return unpack_str(length, offset)
+        end = offset + length
+        if end > size:
+            raise IPCError("Truncated bytes")
+        return data[offset:end], end
+
+    def unpack_str(length: int, offset: int) -> Tuple[str, int]:
+        end = offset + length
+        if end > size:
+            raise IPCError("Truncated string")
+        return data[offset:end].decode(), end
+
+    def unpack_array(length: int, offset: int) -> Tuple[List, int]:
+        items = []
+        append = items.append
+        for _ in range(length):
+            item, offset = unpack(offset)
+            append(item)
+        return items, offset
+
+    def unpack_map(length: int, offset: int) -> Tuple[Dict, int]:
+        mapping = {}
+        for _ in range(length):
+            # most keys are short strings, decode them without a call
+            code = data[offset]
+            if 0xa0 <= code <= 0xbf:
+                end = offset + 1 + (code & 0x1f)
+                if end > size:
+                    raise IPCError("Truncated string")
+                key = data[offset + 1:end].decode()
+                offset = end
+            else:
+                key, offset = unpack(offset)
+                if type(key) is list:
+                    key = tuple(key)
+            mapping[key], offset = unpack(offset)
+        return mapping, offset
+
+    try:
+        obj, offset = unpack(0)
+    except (IndexError, struct.error, UnicodeDecodeError, RecursionError) as e:
+        raise IPCError("Unable to decode binary data") from e
+    if offset != size:
+        raise IPCError("Trailing data after binary message")
+    return obj
+
+
+# (dumps, loads) for each codec
+_CODECS = {
+    CODEC_JSON: (lambda msg: json.dumps(msg).encode(), lambda data: json.loads(data.decode())),
+    CODEC_MARSHAL: (marshal.dumps, marshal.loads),
+    CODEC_BINARY: (dumps_binary, loads_binary),
+}
+
+
 class _IPC:
     """A helper class to handle properly packing and unpacking messages"""
 
@@ -105,9 +363,46 @@ class _IPC:
         size = struct.pack(HDRFORMAT, len(msg_bytes))
         return size + msg_bytes
 
+    @staticmethod
+    def pack_frame(request_id: int, msg: Any, codec: int) -> bytes:
+        """Pack the object into a frame using the given codec"""
+        try:
+            dumps, _ = _CODECS[codec]
+        except KeyError:
+            raise IPCError("Unknown codec: {}".format(codec))
+        try:
+            payload = dumps(msg)
+        except (ValueError, TypeError) as e:
+            raise IPCError("Unable to encode message") from e
+        return struct.pack(FRAMEFORMAT, codec, request_id, len(payload)) + payload
+
+    @staticmethod
+    def unpack_frame(payload: bytes, codec: int) -> Any:
+        """Unpack the payload of a frame read with read_frame"""
+        try:
+            _, loads = _CODECS[codec]
+        except KeyError:
+            raise IPCError("Unknown codec: {}".format(codec))
+        try:
+            return loads(payload)
+        except (ValueError, EOFError, TypeError) as e:
+            raise IPCError("Unable to decode frame") from e
+
+    @staticmethod
+    async def read_frame(reader: asyncio.StreamReader) -> Tuple[int, int, bytes]:
+        """Read the next frame, returning its codec, request id and payload
+
+        Raises asyncio.IncompleteReadError if the connection is closed.
+        """
+        header = await reader.readexactly(FRAMELEN)
+        codec, request_id, size = struct.unpack(FRAMEFORMAT, header)
+        return codec, request_id, await reader.readexactly(size)
+
 
 class Client:
-    def __init__(self, socket_path: str, is_json=False) -> None:
+    def __init__(
+        self, socket_path: str, is_json=False, persistent=False, codec: Optional[int] = None
+    ) -> None:
         """Create a new IPC client
 
         Parameters
@@ -117,9 +412,31 @@ class Client:
             the running IPC server.
         is_json : bool
             Pack and unpack messages as json
+        codec : Optional[int]
+            The codec to pack messages with, one of CODEC_JSON, CODEC_MARSHAL
+            or CODEC_BINARY. Defaults to json if is_json is set and to marshal
+            otherwise.
+        persistent : bool
+            Keep a single connection open for all messages instead of
+            connecting once per message. Messages are framed and tagged with a
+            request id, so several of them can be in flight at once. The
+            connection is bound to the event loop it was opened from; call
+            close() once done with the client.
         """
         self.socket_path = socket_path
         self.is_json = is_json
+        self.persistent = persistent
+        if codec is None:
+            codec = CODEC_JSON if is_json else CODEC_MARSHAL
+        self.codec = codec
+
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._reader = None  # type: Optional[asyncio.StreamReader]
+        self._writer = None  # type: Optional[asyncio.StreamWriter]
+        self._read_task = None  # type: Optional[asyncio.Future]
+        self._connecting = None  # type: Optional[asyncio.Future]
+        self._pending = {}  # type: Dict[int, asyncio.Future]
+        self._last_id = 0
 
     def call(self, data: Any) -> Any:
         return self.send(data)
@@ -130,7 +447,29 @@ class Client:
         If any exception is raised by the server, that will propogate out of
         this call.
         """
-        return asyncio.run(self.async_send(msg))
+        if not self.persistent:
+            return asyncio.run(self.async_send(msg))
+
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(self.async_send(msg))
+
+    def close(self) -> None:
+        """Close the persistent connection, if any"""
+        if self._loop is not None:
+            self._loop.run_until_complete(self.async_close())
+            self._loop.close()
+            self._loop = None
+
+    async def async_close(self) -> None:
+        """Close the persistent connection, if any"""
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+        self._disconnected(IPCError("Connection closed"))
 
     async def async_send(self, msg: Any) -> Any:
         """Send the message to the server
@@ -138,6 +477,9 @@ class Client:
         Connect to the server, then pack and send the message to the server,
         then wait for and return the response from the server.
         """
+        if self.persistent:
+            return await self._send_frame(msg)
+
         try:
             reader, writer = await asyncio.wait_for(
                 asyncio.open_unix_connection(path=self.socket_path), timeout=3
@@ -146,21 +488,129 @@ class Client:
             raise IPCError("Could not open {}".format(self.socket_path))
 
         try:
-            send_data = _IPC.pack(msg, is_json=self.is_json)
-            writer.write(send_data)
+            writer.write(self._preamble() + _IPC.pack_frame(0, msg, self.codec))
             writer.write_eof()
 
-            read_data = await asyncio.wait_for(reader.read(), timeout=10)
+            codec, _, payload = await asyncio.wait_for(_IPC.read_frame(reader), timeout=10)
         except asyncio.TimeoutError:
             raise IPCError("Server not responding")
+        except asyncio.IncompleteReadError as e:
+            raise IPCError(
+                "error reading reply! (probably the socket was disconnected)"
+            ) from e
         finally:
             # see the note in Server._server_callback()
             writer.close()
             await writer.wait_closed()
 
-        data, _ = _IPC.unpack(read_data, is_json=self.is_json)
+        return _IPC.unpack_frame(payload, codec)
+
+    def stream(self, msg: Any) -> Iterator[Any]:
+        """Send the message, then yield every reply until the server is done
+
+        See async_stream.
+        """
+        loop = asyncio.new_event_loop()
+        replies = self.async_stream(msg)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(replies.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(replies.aclose())
+            loop.close()
+
+    async def async_stream(self, msg: Any) -> AsyncIterator[Any]:
+        """Send the message, then yield every reply until the server is done
+
+        The message is sent on a connection of its own, which is closed once
+        the server closes it or the caller stops iterating.
+        """
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(path=self.socket_path), timeout=3
+            )
+        except (ConnectionRefusedError, FileNotFoundError):
+            raise IPCError("Could not open {}".format(self.socket_path))
+
+        try:
+            writer.write(self._preamble() + _IPC.pack_frame(0, msg, self.codec))
+            while True:
+                try:
+                    codec, _, payload = await _IPC.read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                yield _IPC.unpack_frame(payload, codec)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    @staticmethod
+    def _preamble() -> bytes:
+        return PREAMBLE + bytes([PROTOCOL_VERSION])
 
-        return data
+    async def _connect(self) -> None:
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(path=self.socket_path), timeout=3
+            )
+        except (ConnectionRefusedError, FileNotFoundError):
+            raise IPCError("Could not open {}".format(self.socket_path))
+
+        self._writer.write(self._preamble())
+        self._read_task = asyncio.ensure_future(self._read_replies(self._reader))
+
+    async def _send_frame(self, msg: Any) -> Any:
+        if self._writer is None:
+            # concurrent first requests share a single connection attempt
+            if self._connecting is None:
+                self._connecting = asyncio.ensure_future(self._connect())
+            try:
+                await self._connecting
+            finally:
+                self._connecting = None
+        assert self._writer is not None
+
+        self._last_id = self._last_id % 0xffffffff + 1
+        request_id = self._last_id
+        future = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(_IPC.pack_frame(request_id, msg, self.codec))
+            return await asyncio.wait_for(future, timeout=10)
+        except asyncio.TimeoutError:
+            raise IPCError("Server not responding")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _read_replies(self, reader: asyncio.StreamReader) -> None:
+        """Hand replies to the requests waiting for them, in any order"""
+        try:
+            while True:
+                codec, request_id, payload = await _IPC.read_frame(reader)
+                future = self._pending.get(request_id)
+                if future is None or future.done():
+                    continue
+                try:
+                    future.set_result(_IPC.unpack_frame(payload, codec))
+                except IPCError as e:
+                    future.set_exception(e)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self._disconnected(
+                IPCError("error reading reply! (probably the socket was disconnected)")
+            )
+
+    def _disconnected(self, error: Exception) -> None:
+        """Fail the requests in flight; the next one will reconnect"""
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
 
 
 class Server:
@@ -183,11 +633,17 @@ class Server:
         """Callback when a connection is made to the server
 
         Read the data sent from the client, execute the requested command, and
-        send the reply back to the client.
+        send the reply back to the client. Framed connections are handed over
+        to _serve_frames, the rest is for unframed messages from old clients.
         """
         try:
             logger.debug("Connection made to server")
-            data = await reader.read()
+            data = await reader.read(1)
+            if data == PREAMBLE[:1]:
+                await self._serve_frames(reader, writer)
+                return
+
+            data += await reader.read()
             logger.debug("EOF received by server")
 
             req, is_json = _IPC.unpack(data)
@@ -195,6 +651,8 @@ class Server:
             logger.warn("Invalid data received, closing connection")
         else:
             rep = self.handler(req)
+            if inspect.isawaitable(rep):
+                rep = await rep
 
             result = _IPC.pack(rep, is_json=is_json)
 
@@ -206,6 +664,124 @@ class Server:
             writer.close()
             await writer.wait_closed()
 
+    async def _serve_frames(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve framed requests until the client closes the connection
+
+        Each reply is encoded with the codec of its request. Handlers may
+        return an awaitable, whose result is sent once it completes while the
+        following requests are served.
+        """
+        try:
+            preamble = await reader.readexactly(len(PREAMBLE))
+        except asyncio.IncompleteReadError:
+            return
+        if preamble[:-1] != PREAMBLE[1:]:
+            logger.warning("Invalid preamble received, closing connection")
+            return
+        if preamble[-1] != PROTOCOL_VERSION:
+            logger.warning("Unsupported IPC protocol version %d, closing connection", preamble[-1])
+            return
+
+        pending = set()  # type: Set[asyncio.Future]
+        try:
+            while True:
+                try:
+                    codec, request_id, payload = await _IPC.read_frame(reader)
+                    req = _IPC.unpack_frame(payload, codec)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    logger.debug("Connection closed by client")
+                    return
+                except IPCError:
+                    logger.warning("Invalid data received, closing connection")
+                    return
+
+                rep = self.handler(req)
+                if hasattr(rep, "__aiter__"):
+                    # the rest of the connection is dedicated to the stream
+                    await self._stream(reader, writer, request_id, codec, rep)
+                    return
+                if inspect.isawaitable(rep):
+                    task = asyncio.ensure_future(
+                        self._reply_later(writer, request_id, codec, rep)
+                    )
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    continue
+                if not self._reply(writer, request_id, codec, rep):
+                    return
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    return
+        finally:
+            if pending:
+                await asyncio.wait(pending)
+
+    @staticmethod
+    def _reply(writer: asyncio.StreamWriter, request_id: int, codec: int, rep: Any) -> bool:
+        """Send the reply to a request, returning False if it couldn't be encoded"""
+        try:
+            writer.write(_IPC.pack_frame(request_id, rep, codec))
+        except IPCError:
+            logger.exception("Unable to encode reply, closing connection")
+            return False
+        return True
+
+    async def _reply_later(
+        self, writer: asyncio.StreamWriter, request_id: int, codec: int, rep: Awaitable
+    ) -> None:
+        """Send the result of the awaitable once it completes"""
+        try:
+            result = await rep
+        except Exception:
+            logger.exception("Handler failed, closing connection")
+            writer.close()
+            return
+        if not self._reply(writer, request_id, codec, result):
+            writer.close()
+
+    async def _stream(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        request_id: int,
+        codec: int,
+        replies: AsyncIterator[Any],
+    ) -> None:
+        """Send every item of replies as a reply to the request
+
+        Stops when replies is exhausted or the client closes the connection.
+        Writes wait for the client to catch up, replies had better not hold up
+        anything else in the meantime.
+        """
+        closed = asyncio.ensure_future(reader.read())
+        iterator = replies.__aiter__()
+        try:
+            while True:
+                item = asyncio.ensure_future(iterator.__anext__())
+                await asyncio.wait({item, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if not item.done():
+                    logger.debug("Stream closed by client")
+                    item.cancel()
+                    return
+                try:
+                    rep = item.result()
+                except StopAsyncIteration:
+                    return
+                writer.write(_IPC.pack_frame(request_id, rep, codec))
+                await writer.drain()
+        except IPCError:
+            logger.exception("Unable to encode reply, closing connection")
+        except ConnectionError:
+            logger.debug("Stream closed by client")
+        finally:
+            closed.cancel()
+            aclose = getattr(replies, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
     async def __aenter__(self) -> "Server":
         """Start and return the server"""
         await self.start()
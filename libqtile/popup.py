@@ -69,7 +69,8 @@ class Popup(configurable.Configurable):
         self.layout.layout.set_alignment(pangocffi.ALIGNMENTS[self.text_alignment])
 
         if self.border_width:
-            self.win.window.configure(borderwidth=self.border_width)
+            # through the window, so that placing it knows the border width
+            self.win.paint_borders(self.border, self.border_width)
         if self.corner_radius:
             self.win.window.round_corners(width, height, self.corner_radius, self.border_width)
 
@@ -129,7 +130,7 @@ class Popup(configurable.Configurable):
             self.layout.colour = value
 
     def set_border(self, color):
-        self.win.window.paint_borders(color)
+        self.win.paint_borders(color, self.border_width)
 
     def clear(self):
         self.drawer.clear(self.background)
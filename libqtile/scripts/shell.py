@@ -27,13 +27,16 @@ def qshell(args) -> None:
         socket = ipc.find_sockfile()
     else:
         socket = args.socket
-    client = ipc.Client(socket, is_json=args.is_json)
+    client = ipc.Client(socket, is_json=args.is_json, persistent=True)
     cmd_object = interface.IPCCommandInterface(client)
     qsh = sh.QSh(cmd_object)
-    if args.command is not None:
-        qsh.process_line(args.command)
-    else:
-        qsh.loop()
+    try:
+        if args.command is not None:
+            qsh.process_line(args.command)
+        else:
+            qsh.loop()
+    finally:
+        client.close()
 
 
 def add_subcommand(subparsers):
@@ -139,7 +139,52 @@ def raw_stats(c, group_by='lineno', limit=10, force_start=False):
     print("Total allocated size: {0:.1f} KiB".format(total / 1024.0))
 
 
+def get_hook_stats(c, limit):
+    """The subscribers of hooks that ran for the longest in total"""
+    stats = [
+        (hook, name, entry)
+        for hook, subscribers in c.hook_stats().items()
+        for name, entry in subscribers.items()
+    ]
+    stats.sort(key=lambda stat: stat[2]["total"], reverse=True)
+    return stats[:limit]
+
+
+def format_hook_stat(index, hook, name, entry):
+    return '{:<3} {:<24} {:<60} {:>8d} {:>10.1f} {:>8.1f}'.format(
+        index, hook, name[-60:], entry["calls"], entry["total"] * 1000, entry["max"] * 1000
+    )
+
+
+HOOK_STATS_HEADER = '{:<3} {:<24} {:<60} {:>8} {:>10} {:>8}'.format(
+    '#', 'Hook', 'Subscriber', 'Calls', 'Total ms', 'Max ms'
+)
+
+
+def get_hooks(scr, c, limit=10, seconds=1.5):
+    (max_y, max_x) = scr.getmaxyx()
+    while True:
+        scr.addstr(0, 0, "Qtile - Top {} hook subscribers".format(limit))
+        scr.addstr(1, 0, HOOK_STATS_HEADER, curses.A_BOLD | curses.A_REVERSE)
+        for index, stat in enumerate(get_hook_stats(c, limit), 1):
+            scr.addstr(index + 1, 0, format_hook_stat(index, *stat))
+
+        scr.move(max_y - 2, max_y - 2)
+        scr.refresh()
+        time.sleep(seconds)
+        scr.erase()
+
+
+def raw_hooks(c, limit=10):
+    print("Qtile - Top {} hook subscribers".format(limit))
+    print(HOOK_STATS_HEADER)
+    for index, stat in enumerate(get_hook_stats(c, limit), 1):
+        print(format_hook_stat(index, *stat))
+
+
 def top(opts):
+    if opts.hooks:
+        return hook_top(opts)
     if not ENABLED:
         raise Exception('Could not import tracemalloc')
     lines = opts.lines
@@ -149,10 +194,9 @@ def top(opts):
         socket = ipc.find_sockfile()
     else:
         socket = opts.socket
+    ipc_client = ipc.Client(socket, persistent=True)
     c = client.InteractiveCommandClient(
-        interface.IPCCommandInterface(
-            ipc.Client(socket),
-        ),
+        interface.IPCCommandInterface(ipc_client),
     )
 
     try:
@@ -173,6 +217,29 @@ def top(opts):
     except curses.error:
         print("Terminal too small for curses interface.")
         raw_stats(c, limit=lines, force_start=force_start)
+    finally:
+        ipc_client.close()
+
+
+def hook_top(opts):
+    socket = ipc.find_sockfile() if opts.socket is None else opts.socket
+    ipc_client = ipc.Client(socket, persistent=True)
+    c = client.InteractiveCommandClient(
+        interface.IPCCommandInterface(ipc_client),
+    )
+
+    try:
+        if not opts.raw:
+            curses.wrapper(get_hooks, c, limit=opts.lines, seconds=opts.seconds)
+        else:
+            raw_hooks(c, limit=opts.lines)
+    except KeyboardInterrupt:
+        exit(-1)
+    except curses.error:
+        print("Terminal too small for curses interface.")
+        raw_hooks(c, limit=opts.lines)
+    finally:
+        ipc_client.close()
 
 
 def add_subcommand(subparsers):
@@ -188,4 +255,8 @@ def add_subcommand(subparsers):
                         help='Force start tracemalloc on qtile')
     parser.add_argument('-s', '--socket', type=str, dest="socket",
                         help='Use specified communication socket.')
+    parser.add_argument('--hooks', dest="hooks", action="store_true",
+                        default=False,
+                        help='Show the hook subscribers taking the most time '
+                             'instead of memory usage')
     parser.set_defaults(func=top)
@@ -30,6 +30,7 @@ from collections import defaultdict
 from collections.abc import Sequence
 from random import randint
 from shutil import which
+from typing import Dict, Tuple
 
 try:
     from dbus_next import Message, Variant  # type: ignore
@@ -67,6 +68,10 @@ def shuffle_down(lst):
         lst.append(c)
 
 
+# the RGBA tuples of the colour strings given to rgb()
+_rgb_strings = {}  # type: Dict[str, Tuple[float, float, float, float]]
+
+
 def rgb(x):
     """
         Returns a valid RGBA tuple.
@@ -86,6 +91,12 @@ def rgb(x):
             alpha = 1
         return (x[0] / 255.0, x[1] / 255.0, x[2] / 255.0, alpha)
     elif isinstance(x, str):
+        # colour strings are parsed once, not every time they are drawn with
+        try:
+            return _rgb_strings[x]
+        except KeyError:
+            pass
+        spec = x
         if x.startswith("#"):
             x = x[1:]
         if "." in x:
@@ -99,7 +110,11 @@ def rgb(x):
         if len(x) == 8:
             alpha = int(x[6:8], 16) / 255.0
         vals.append(alpha)
-        return rgb(vals)
+        rgba = rgb(vals)
+        if len(_rgb_strings) >= 256:
+            _rgb_strings.clear()
+        _rgb_strings[spec] = rgba
+        return rgba
     raise ValueError("Invalid RGB specifier.")
 
 
@@ -113,6 +113,10 @@ class _Widget(CommandObject, configurable.Configurable):
     orientations = ORIENTATION_BOTH
     offsetx = None
     offsety = None
+    # Whether the widget has to be drawn again when other widgets move it
+    # along the bar, instead of having its pixels moved, e.g. because it
+    # places windows of its own.
+    redraw_on_move = False
     defaults = [
         ("background", None, "Widget background color"),
         ("mouse_callbacks", {}, "Dict of mouse button press callback functions."),
@@ -194,12 +198,7 @@ class _Widget(CommandObject, configurable.Configurable):
     def _configure(self, qtile, bar):
         self.qtile = qtile
         self.bar = bar
-        self.drawer = drawer.Drawer(
-            qtile,
-            self.win.wid,
-            self.bar.width,
-            self.bar.height
-        )
+        self.drawer = drawer.SharedDrawer(self.bar.drawer)
         if not self.configured:
             self.configured = True
             self.qtile.call_soon(self.timer_setup)
@@ -341,7 +340,13 @@ class _TextBox(_Widget):
             "font shadow color, default is None(no shadow)"
         ),
         ("markup", True, "Whether or not to use pango markup"),
-        ("fmt", "{}", "How to format the text")
+        ("fmt", "{}", "How to format the text"),
+        (
+            "rasterize",
+            False,
+            "Draw the text from images of the texts drawn recently, "
+            "anti-aliasing may differ from text drawn directly"
+        ),
     ]  # type: List[Tuple[str, Any, str]]
 
     def __init__(self, text=" ", width=bar.CALCULATED, **config):
@@ -412,6 +417,7 @@ class _TextBox(_Widget):
             self.fontsize,
             self.fontshadow,
             markup=self.markup,
+            rasterize=self.rasterize,
         )
 
     def calculate_length(self):
@@ -446,7 +452,7 @@ class _TextBox(_Widget):
             self.fontsize = fontsize
         if fontshadow is not UNSPECIFIED:
             self.fontshadow = fontshadow
-        self.bar.draw()
+        self.bar.draw(self)
 
     def info(self):
         d = _Widget.info(self)
@@ -507,11 +513,11 @@ class InLoopPollText(_TextBox):
         if self.text != text:
             self.text = text
             # If our width hasn't changed, we just draw ourselves. Otherwise,
-            # we draw the whole bar.
+            # the bar draws us and moves the widgets after us.
             if self.layout.width == old_width:
                 self.draw()
             else:
-                self.bar.draw()
+                self.bar.draw(self)
 
 
 class ThreadPoolText(_TextBox):
@@ -569,7 +575,7 @@ class ThreadPoolText(_TextBox):
         if self.layout.width == old_width:
             self.draw()
         else:
-            self.bar.draw()
+            self.bar.draw(self)
 
     def poll(self):
         pass
@@ -637,7 +643,7 @@ class Mirror(_Widget):
     def draw(self):
         if self._length != self.reflects.length:
             self._length = self.length
-            self.bar.draw()
+            self.bar.draw(self)
         else:
             self.reflects.drawer.paint_to(self.drawer)
             self.drawer.draw(offsetx=self.offset, width=self.width)
@@ -75,6 +75,7 @@ class _GroupBase(base._TextBox, base.PaddingMixin, base.MarginMixin):
         self.setup_hooks()
 
     def setup_hooks(self):
+        @hook.debounce
         def hook_response(*args, **kwargs):
             self.bar.draw()
         hook.subscribe.client_managed(hook_response)
@@ -34,7 +34,7 @@ from xcffib.xproto import (
     SetMode,
 )
 
-from libqtile import bar, window
+from libqtile import bar, drawer, window
 from libqtile.backend.x11 import xcbq
 from libqtile.widget import base
 
@@ -99,6 +99,7 @@ class Systray(window._Window, base._Widget):
         EventMask.Exposure
 
     orientations = base.ORIENTATION_HORIZONTAL
+    redraw_on_move = True
 
     defaults = [
         ('icon_size', 20, 'Icon width'),
@@ -118,6 +119,16 @@ class Systray(window._Window, base._Widget):
 
     def _configure(self, qtile, bar):
         base._Widget._configure(self, qtile, bar)
+        # The icons are tiled with this pixmap, it is filled with the
+        # background of the widget as the pixmap of the bar holds the drawing
+        # of every widget.
+        self.icon_background = drawer.Drawer(
+            qtile,
+            self.win.wid,
+            self.icon_size,
+            self.bar.height
+        )
+        self.icon_background.clear(self.background or self.bar.background)
         win = qtile.conn.create_window(-1, -1, 1, 1)
         window._Window.__init__(self, xcbq.Window(qtile.conn, win.wid), qtile)
         qtile.windows_map[win.wid] = self
@@ -186,13 +197,15 @@ class Systray(window._Window, base._Widget):
         self.drawer.clear(self.background or self.bar.background)
         self.drawer.draw(offsetx=self.offset, width=self.length)
         for pos, icon in enumerate(self.icons.values()):
-            icon.window.set_attribute(backpixmap=self.drawer.pixmap)
+            icon.window.set_attribute(backpixmap=self.icon_background.pixmap)
+            # icons resize themselves, what was last sent to them may not hold
             icon.place(
                 self.offset + xoffset,
                 self.bar.height // 2 - self.icon_size // 2,
                 icon.width, self.icon_size,
                 0,
-                None
+                None,
+                force=True,
             )
             if icon.hidden:
                 icon.unhide()
@@ -216,6 +229,7 @@ class Systray(window._Window, base._Widget):
 
     def finalize(self):
         base._Widget.finalize(self)
+        self.icon_background.finalize()
         atoms = self.qtile.conn.atoms
         self.qtile.conn.conn.core.SetSelectionOwner(
             0,
@@ -51,6 +51,7 @@ class WindowTabs(base._TextBox):
         hook.subscribe.float_change(self.update)
         self.add_callbacks({'Button1': self.bar.screen.group.cmd_next_window})
 
+    @hook.debounce
     def update(self, *args):
         names = []
         for w in self.bar.screen.group.windows:
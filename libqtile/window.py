@@ -147,6 +147,10 @@ class _Window(CommandObject):
         self.group = None
         self.icons = {}
         window.set_attribute(eventmask=self._window_mask)
+        if self._window_mask & EventMask.PropertyChange:
+            # the PropertyNotify events keep the cache fresh (see
+            # Core._drain_events), windows not selecting them go uncached
+            window.enable_property_cache()
 
         self._float_info = {
             'x': None,
@@ -172,6 +176,12 @@ class _Window(CommandObject):
 
         self.borderwidth = 0
         self.bordercolor = None
+        # what place() and paint_borders() last sent to the server, to skip
+        # requests that wouldn't change anything
+        self._placed = None
+        self._placed_borderwidth = None
+        self._placed_bordercolor = None
+        self.suppressed_requests = 0
         self.name = "<no name>"
         self.strut = None
         self.state = NormalState
@@ -323,7 +333,8 @@ class _Window(CommandObject):
             float_info=self._float_info,
             maximized=self._float_state == MAXIMIZED,
             minimized=self._float_state == MINIMIZED,
-            fullscreen=self._float_state == FULLSCREEN
+            fullscreen=self._float_state == FULLSCREEN,
+            suppressed_requests=self.suppressed_requests,
         )
 
     @property
@@ -409,10 +420,14 @@ class _Window(CommandObject):
         )
 
     def place(self, x, y, width, height, borderwidth, bordercolor,
-              above=False, margin=None):
+              above=False, margin=None, force=False):
         """
         Places the window at the specified location with the given size.
 
+        Unless the skip_redundant_configures config variable is False,
+        requests which wouldn't change anything since the last call are
+        skipped.
+
         Parameters
         ==========
         x : int
@@ -424,22 +439,10 @@ class _Window(CommandObject):
         above : bool, optional
         margin : int or list, optional
             space around window as int or list of ints [N E S W]
+        force : bool, optional
+            send every request, e.g. to answer a ConfigureRequest
         """
 
-        # TODO: self.x/y/height/width are updated BEFORE
-        # place is called, so there's no way to know if only
-        # the position is changed, so we are sending
-        # the ConfigureNotify every time place is called
-        #
-        # # if position change and size don't
-        # # send a configure notify. See ICCCM 4.2.3
-        # send_notify = False
-        # if (self.x != x or self.y != y) and \
-        #    (self.width == width and self.height == height):
-        #       send_notify = True
-        # #for now, we just:
-        send_notify = True
-
         # Adjust the placement to account for layout margins, if there are any.
         if margin is not None:
             if isinstance(margin, int):
@@ -459,26 +462,54 @@ class _Window(CommandObject):
         self.width = width
         self.height = height
 
-        kwarg = dict(
-            x=x,
-            y=y,
-            width=width,
-            height=height,
-        )
+        # self.x/y/width/height are often updated by layouts before place is
+        # called, so compare with what was last sent instead
+        force = force or not self.qtile.config.skip_redundant_configures
+        geometry = (x, y, width, height)
+        if force or geometry != self._placed:
+            self._placed = geometry
+            kwarg = dict(
+                x=x,
+                y=y,
+                width=width,
+                height=height,
+            )
+            if above:
+                kwarg['stackmode'] = StackMode.Above
+            self.window.configure(**kwarg)
+            send_notify = True
+        else:
+            # the ConfigureNotify, and the ConfigureWindow unless raising
+            if above:
+                self.window.configure(stackmode=StackMode.Above)
+                self.suppressed_requests += 1
+            else:
+                self.suppressed_requests += 2
+            send_notify = False
         if above:
-            kwarg['stackmode'] = StackMode.Above
+            self.qtile.raise_in_client_list(self.window.wid)
 
-        self.window.configure(**kwarg)
-        self.paint_borders(bordercolor, borderwidth)
+        self.paint_borders(bordercolor, borderwidth, force)
 
         if send_notify:
             self.send_configure_notify(x, y, width, height)
 
-    def paint_borders(self, borderpixel, borderwidth):
+    def paint_borders(self, borderpixel, borderwidth, force=False):
         self.borderwidth = borderwidth
         self.bordercolor = borderpixel
-        self.window.configure(borderwidth=borderwidth)
-        self.window.paint_borders(borderpixel)
+        force = force or not self.qtile.config.skip_redundant_configures
+        if force or borderwidth != self._placed_borderwidth:
+            self._placed_borderwidth = borderwidth
+            self.window.configure(borderwidth=borderwidth)
+        else:
+            self.suppressed_requests += 1
+        if not borderpixel:
+            return
+        if force or borderpixel != self._placed_bordercolor:
+            self._placed_bordercolor = borderpixel
+            self.window.paint_borders(borderpixel)
+        else:
+            self.suppressed_requests += 1
 
     def send_configure_notify(self, x, y, width, height):
         """Send a synthetic ConfigureNotify"""
@@ -718,7 +749,8 @@ class Static(_Window):
             self.width,
             self.height,
             self.borderwidth,
-            self.bordercolor
+            self.bordercolor,
+            force=True,
         )
         return False
 
@@ -915,6 +947,7 @@ class Window(_Window):
             screen = self.qtile.screens[screen]
         if self.group:
             self.group.remove(self)
+        self.qtile.remove_from_client_list(self.window.wid)
         s = Static(self.window, self.qtile, screen, x, y, width, height)
         self.qtile.windows_map[self.window.wid] = s
         hook.fire("client_managed", s)
@@ -1081,10 +1114,12 @@ class Window(_Window):
             width, height, x, y = self.width, self.height, self.x, self.y
 
         if self.group and self.group.screen:
+            # the client waits for a ConfigureNotify, even if nothing changed
             self.place(
                 x, y,
                 width, height,
                 self.borderwidth, self.bordercolor,
+                force=True,
             )
         self.update_state()
         return False
@@ -1319,9 +1354,9 @@ class Window(_Window):
         self.tweak_float(w=w, h=h)
 
     def cmd_place(self, x, y, width, height, borderwidth, bordercolor,
-                  above=False, margin=None):
+                  above=False, margin=None, force=False):
         self.place(x, y, width, height, borderwidth, bordercolor, above,
-                   margin)
+                   margin, force)
 
     def cmd_get_position(self):
         return self.getposition()
@@ -1356,6 +1391,7 @@ class Window(_Window):
     def cmd_bring_to_front(self):
         if self.floating:
             self.window.configure(stackmode=StackMode.Above)
+            self.qtile.raise_in_client_list(self.window.wid)
         else:
             self._reconfigure_floating()  # atomatically above
 
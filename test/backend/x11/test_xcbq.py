@@ -27,6 +27,88 @@ def test_new_window(xdisplay):
         win.get_geometry()
 
 
+def test_window_snapshot(xdisplay):
+    conn = xcbq.Connection(xdisplay)
+    win = conn.create_window(1, 2, 640, 480)
+    win.set_property("WM_CLASS", "snapshot\0Snapshot\0", type="STRING", format=8)
+    win.set_property("QTILE_INTERNAL", 1)
+
+    snapshot = win.take_snapshot()
+    assert win.take_snapshot() is snapshot
+    assert win.get_geometry().width == 640
+    assert not win.get_attributes().override_redirect
+    assert win.get_wm_class() == ("snapshot", "Snapshot")
+    assert win.get_property("QTILE_INTERNAL", unpack=int) == [1]
+    assert win.get_wm_state() == []
+
+    # writes through the window are never answered from a stale snapshot
+    win.set_property("WM_STATE", [1, 0])
+    assert win.get_wm_state() == [1, 0]
+
+    win.release_snapshot()
+    assert win.snapshot is None
+    assert win.get_wm_class() == ("snapshot", "Snapshot")
+
+
+def test_partial_window_snapshot(xdisplay):
+    conn = xcbq.Connection(xdisplay)
+    win = conn.create_window(1, 2, 640, 480)
+    win.set_property("WM_CLASS", "partial\0Partial\0", type="STRING", format=8)
+
+    snapshot = win.take_snapshot([("WM_STATE", xcffib.xproto.GetPropertyType.Any)])
+    assert "attributes" in snapshot
+    assert "geometry" not in snapshot
+    assert win.get_wm_state() == []
+    # anything not requested yet is still read from the server
+    assert win.get_wm_class() == ("partial", "Partial")
+
+    assert win.take_snapshot() is snapshot
+    assert "geometry" in snapshot
+    assert win.get_geometry().width == 640
+    win.release_snapshot()
+
+
+def test_property_cache(xdisplay):
+    conn = xcbq.Connection(xdisplay)
+    win = conn.create_window(1, 2, 640, 480)
+    win.set_property("WM_CLASS", "cached\0Cached\0", type="STRING", format=8)
+    win.enable_property_cache()
+
+    assert win.get_wm_class() == ("cached", "Cached")
+    assert win.get_wm_class() == ("cached", "Cached")
+    assert win.get_wm_window_role() is None
+    assert win.get_wm_window_role() is None
+    assert conn.property_cache_misses == 2
+    assert conn.property_cache_hits == 2
+
+    win.set_property("WM_CLASS", "other\0Other\0", type="STRING", format=8)
+    assert win.get_wm_class() == ("other", "Other")
+    assert conn.property_cache_misses == 3
+
+    win.invalidate_property(conn.atoms["WM_CLASS"])
+    assert win.get_wm_class() == ("other", "Other")
+    assert conn.property_cache_misses == 4
+
+    # icons are too large to be kept around
+    win.set_property("_NET_WM_ICON", [1, 1, 0xffffffff])
+    assert win.get_property("_NET_WM_ICON", "CARDINAL", unpack=int) == [1, 1, 0xffffffff]
+    assert not any(key[0] == conn.atoms["_NET_WM_ICON"] for key in win.property_cache)
+    assert conn.property_cache_misses == 4
+
+
+def test_set_property_unchecked(xdisplay):
+    conn = xcbq.Connection(xdisplay)
+    win = conn.create_window(1, 2, 640, 480)
+    win.set_property("WM_WINDOW_ROLE", "unchecked", type="STRING", format=8)
+    assert win.get_wm_window_role() == "unchecked"
+
+    conn.conn.core.DestroyWindow(win.wid)
+    conn.xsync()
+    # no round trip, the error is received by the poll loop instead
+    win.set_property("WM_WINDOW_ROLE", "gone", type="STRING", format=8)
+    win.set_property("WM_WINDOW_ROLE", "gone", type="STRING", format=8, checked=True)
+
+
 def test_masks():
     cfgmasks = xcbq.ConfigureMasks
     d = {'x': 1, 'y': 2, 'width': 640, 'height': 480}
@@ -1,4 +1,6 @@
-from libqtile.backend.x11 import core
+import xcffib.xproto
+
+from libqtile.backend.x11 import core, xcbq
 
 
 def test_keys(display):
@@ -13,3 +15,133 @@ def test_no_two_qtiles(manager):
         pass
     else:
         raise Exception("expected an error on multiple qtiles connecting")
+
+
+def _motion(wid, x):
+    return xcffib.xproto.MotionNotifyEvent.synthetic(
+        0, 0, 1, wid, 0, x, x, x, x, 0, True
+    )
+
+
+def _configure_request(wid, value_mask, **values):
+    args = dict(
+        stack_mode=0, parent=1, window=wid, sibling=0, x=0, y=0,
+        width=0, height=0, border_width=0, value_mask=value_mask,
+    )
+    args.update(values)
+    return xcffib.xproto.ConfigureRequestEvent.synthetic(**args)
+
+
+def test_coalesce_motion():
+    dropped = {}
+    events = [_motion(5, i) for i in range(10)] + [_motion(6, 0)]
+    result = core.coalesce_events(events, dropped)
+    assert [(e.event, e.event_x) for e in result] == [(5, 9), (6, 0)]
+    assert dropped == {"MotionNotify": 9}
+
+
+def test_coalesce_barrier():
+    dropped = {}
+    release = xcffib.xproto.ButtonReleaseEvent.synthetic(
+        1, 0, 1, 5, 0, 0, 0, 0, 0, 0, True
+    )
+    events = [_motion(5, 1), _motion(5, 2), release, _motion(5, 3)]
+    result = core.coalesce_events(events, dropped)
+    assert [e.__class__.__name__ for e in result] == [
+        "MotionNotifyEvent", "ButtonReleaseEvent", "MotionNotifyEvent"
+    ]
+    assert result[0].event_x == 2
+    assert dropped == {"MotionNotify": 1}
+
+
+def test_coalesce_property_notify():
+    dropped = {}
+    events = [
+        xcffib.xproto.PropertyNotifyEvent.synthetic(5, atom, 0, 0)
+        for atom in (39, 40, 39, 39)
+    ]
+    result = core.coalesce_events(events, dropped)
+    assert [e.atom for e in result] == [40, 39]
+    assert dropped == {"PropertyNotify": 2}
+
+
+def test_coalesce_configure_request():
+    cw = xcffib.xproto.ConfigWindow
+    dropped = {}
+    events = [
+        _configure_request(5, cw.X | cw.Width, x=10, width=100),
+        _configure_request(5, cw.Width | cw.Height, width=200, height=50),
+    ]
+    result = core.coalesce_events(events, dropped)
+    assert len(result) == 1
+    merged = result[0]
+    assert merged.value_mask == cw.X | cw.Width | cw.Height
+    assert (merged.x, merged.width, merged.height) == (10, 200, 50)
+    assert dropped == {"ConfigureRequest": 1}
+
+
+class _FakeXcbConnection:
+    def __init__(self, events):
+        self.events = events
+
+    def poll_for_event(self):
+        return self.events.pop(0) if self.events else None
+
+
+class _FakeConnection:
+    def __init__(self, events):
+        self.conn = _FakeXcbConnection(events)
+        self.timestamp = 0
+        self.timestamp_probes = 0
+        self.timestamp_window = xcbq.Window(None, 9)
+
+
+class _FakeQtile:
+    windows_map = {}
+
+
+def _drain(xcore, events):
+    xcore.conn.conn.events = events
+    return xcore._drain_events()
+
+
+def test_drain_events_timestamp():
+    xcore = core.Core.__new__(core.Core)
+    xcore.qtile = _FakeQtile()
+    xcore.conn = _FakeConnection([])
+
+    def motion(time):
+        return xcffib.xproto.MotionNotifyEvent.synthetic(
+            0, time, 1, 5, 0, 0, 0, 0, 0, 0, True
+        )
+
+    def probe(time):
+        return xcffib.xproto.PropertyNotifyEvent.synthetic(9, 67, time, 0)
+
+    _drain(xcore, [motion(100), motion(120)])
+    assert xcore.conn.timestamp == 120
+
+    # the focus was changed with CurrentTime twice: events older than the
+    # second probe can't be trusted
+    xcore.conn.timestamp = 0
+    xcore.conn.timestamp_probes = 2
+    assert len(_drain(xcore, [motion(130), probe(140), motion(150)])) == 2
+    assert xcore.conn.timestamp == 0
+    assert _drain(xcore, [probe(160)]) == []
+    assert xcore.conn.timestamp == 160
+    _drain(xcore, [motion(170)])
+    assert xcore.conn.timestamp == 170
+
+
+def test_valid_timestamp(display):
+    xcore = core.Core(display)
+    try:
+        # no event was received yet, the server is asked for its time
+        first = xcore.get_valid_timestamp()
+        assert first
+        assert xcore.get_valid_timestamp() >= first
+        assert xcore._timestamp_conn is not None
+        xcore.conn.timestamp = first + 1
+        assert xcore.get_valid_timestamp() == first + 1
+    finally:
+        xcore.finalize()
@@ -0,0 +1,101 @@
+"""
+Redraw a bar of text widgets
+
+The bar holds text widgets like clocks and CPU or memory percentages, each
+cycling through a few strings. The whole bar is drawn again and again, first
+laying the texts out with Pango on every draw, then drawing them from the
+images of the texts drawn recently. The bar draws into an image instead of a
+pixmap, so no X server is needed.
+
+Run with::
+
+    python -m test.benchmarks.bench_bar
+"""
+import argparse
+import asyncio
+import logging
+import timeit
+
+import cairocffi
+
+from libqtile import bar, drawer
+from libqtile.log_utils import logger
+from libqtile.widget.textbox import TextBox
+
+TEXTS = ["12:0{}".format(i) for i in range(10)] + ["{}%".format(i) for i in range(0, 100, 7)]
+
+
+class FakeQtile:
+    def call_soon(self, func, *args):
+        # the widgets aren't started, close the coroutines they would run
+        for arg in args:
+            if asyncio.iscoroutine(arg):
+                arg.close()
+
+
+class ImageDrawer(drawer.Drawer):
+    """A bar drawer painting into an image instead of a pixmap"""
+    def _prepare(self):
+        if self._surface is None:
+            self._surface = cairocffi.ImageSurface(
+                cairocffi.FORMAT_RGB24, self.width, self.height
+            )
+        self._paint()
+
+    def damage(self, x, y, width, height):
+        pass
+
+
+def make_bar(widgets, length, rasterize):
+    qtile = FakeQtile()
+    b = bar.Bar(
+        [TextBox(TEXTS[0], rasterize=rasterize, fontshadow="000000") for _ in range(widgets)],
+        24,
+    )
+    b.qtile = qtile
+    b.horizontal = True
+    b.width = b.length = length
+    b.height = b.size = 24
+    b.drawer = ImageDrawer(qtile, 0, b.width, b.height)
+    for w in b.widgets:
+        w._configure(qtile, b)
+    return b
+
+
+def run(name, b, redraws, repeat):
+    def replay():
+        for i in range(redraws):
+            for j, w in enumerate(b.widgets):
+                w.text = TEXTS[(i + j) % len(TEXTS)]
+            b.draw()
+            b._actual_draw()
+
+    best = min(timeit.repeat(replay, number=1, repeat=repeat))
+    print("{:>10}: {:8.1f} us per redraw, {:8.0f} redraws/s".format(
+        name, best / redraws * 1e6, redraws / best
+    ))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--redraws", type=int, default=10000)
+    parser.add_argument("-w", "--widgets", type=int, default=30)
+    parser.add_argument("-l", "--length", type=int, default=3840)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    pango = run(
+        "pango", make_bar(args.widgets, args.length, False), args.redraws, args.repeat
+    )
+    rasterized = run(
+        "rasterized", make_bar(args.widgets, args.length, True), args.redraws, args.repeat
+    )
+    print("speedup: {:.2f}x, {:.0%} of the texts drawn from images".format(
+        pango / rasterized, drawer.text_surfaces.stats()["hit_rate"]
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Compare the IPC codecs on large replies
+
+For replies shaped like those of cmd_windows, cmd_groups and cmd_get_state,
+print the payload size and encode + decode time of every codec, the time the
+old unframed protocol spent sniffing a marshalled message for json first, and
+the latency of complete calls through a server on a temporary socket.
+
+Run with::
+
+    python -m test.benchmarks.bench_ipc
+"""
+import argparse
+import asyncio
+import os
+import timeit
+from tempfile import TemporaryDirectory
+
+from libqtile import ipc
+
+CODECS = [
+    ("json", ipc.CODEC_JSON),
+    ("marshal", ipc.CODEC_MARSHAL),
+    ("binary", ipc.CODEC_BINARY),
+]
+
+
+def windows_reply(count):
+    """What cmd_windows returns with the given number of windows open"""
+    return [
+        dict(
+            name="window {} - some application title".format(i),
+            x=i * 10,
+            y=i * 5,
+            width=800,
+            height=600,
+            group=str(i % 9 + 1),
+            id=0x1e00000 + i,
+            floating=i % 4 == 0,
+            float_info={"x": None, "y": None, "width": 640, "height": 480},
+            maximized=False,
+            minimized=False,
+            fullscreen=False,
+        )
+        for i in range(count)
+    ]
+
+
+def groups_reply():
+    """What cmd_groups returns for the default config"""
+    return {
+        str(i): dict(
+            name=str(i),
+            focus="window {}".format(i),
+            windows=["window {}".format(j) for j in range(5)],
+            layout="max",
+            layouts=["max", "stack"],
+            floating_info={"clients": [], "group": str(i), "name": "floating"},
+            screen=0 if i == 1 else None,
+        )
+        for i in range(1, 10)
+    }
+
+
+def state_reply(count):
+    """What cmd_get_state returns: the pickled state as a string"""
+    return "".join("\\x80\\x04 group {} window {} ".format(i % 9, i) for i in range(count * 20))
+
+
+def bench_codecs(name, reply, repeat):
+    print("{} reply:".format(name))
+    for codec_name, codec in CODECS:
+        frame = ipc._IPC.pack_frame(1, reply, codec)
+        payload = frame[ipc.FRAMELEN:]
+
+        def roundtrip():
+            ipc._IPC.unpack_frame(ipc._IPC.pack_frame(1, reply, codec)[ipc.FRAMELEN:], codec)
+
+        best = min(timeit.repeat(roundtrip, number=10, repeat=repeat)) / 10
+        print("  {:>8}: {:8d} bytes, {:8.1f} us encode + decode".format(
+            codec_name, len(payload), best * 1e6
+        ))
+
+    unframed = ipc._IPC.pack(reply)
+    best = min(timeit.repeat(lambda: ipc._IPC.unpack(unframed), number=10, repeat=repeat)) / 10
+    print("  {:>8}: {:8d} bytes, {:8.1f} us decode, sniffing for json first".format(
+        "unframed", len(unframed), best * 1e6
+    ))
+
+
+async def bench_calls(replies, calls):
+    with TemporaryDirectory() as tempdir:
+        socket_path = os.path.join(tempdir, "qtilesocket")
+        async with ipc.Server(socket_path, lambda name: replies[name]):
+            for name in replies:
+                print("{} calls:".format(name))
+                for codec_name, codec in CODECS:
+                    for persistent in (False, True):
+                        client = ipc.Client(socket_path, codec=codec, persistent=persistent)
+                        loop = asyncio.get_event_loop()
+                        start = loop.time()
+                        for _ in range(calls):
+                            await client.async_send(name)
+                        elapsed = loop.time() - start
+                        await client.async_close()
+                        print("  {:>8} {:>10}: {:8.1f} us per call".format(
+                            codec_name,
+                            "persistent" if persistent else "one-shot",
+                            elapsed / calls * 1e6,
+                        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-w", "--windows", type=int, default=200)
+    parser.add_argument("-n", "--calls", type=int, default=200)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    replies = {
+        "windows": windows_reply(args.windows),
+        "groups": groups_reply(),
+        "get_state": state_reply(args.windows),
+    }
+    for name, reply in replies.items():
+        bench_codecs(name, reply, args.repeat)
+    asyncio.run(bench_calls(replies, args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Dispatch key bindings through Qtile.process_key_event
+
+The bindings of a typical config act on the current layout, window, group and
+screen and on the root object. Each one is dispatched with the full command
+graph resolution that key presses used to go through, then with the calls that
+are compiled when keys are grabbed.
+
+Run with::
+
+    python -m test.benchmarks.bench_keys
+"""
+import argparse
+import logging
+import timeit
+
+from libqtile import config
+from libqtile.command.base import CommandObject
+from libqtile.command.interface import IPCCommandServer
+from libqtile.core.manager import Qtile
+from libqtile.lazy import lazy
+from libqtile.log_utils import logger
+
+BINDINGS = [
+    lazy.layout.down(),
+    lazy.layout.up(),
+    lazy.window.kill(),
+    lazy.window.toggle_floating(),
+    lazy.group["3"].toscreen(),
+    lazy.screen.info(),
+    lazy.spawn("true"),
+]
+
+
+class FakeNode(CommandObject):
+    """A command graph object whose commands do nothing"""
+    name = "fake"
+    floating = False
+
+    def __init__(self, wid=0):
+        self.window = self
+        self.wid = wid
+
+    def _items(self, name):
+        return None
+
+    def _select(self, name, sel):
+        return None
+
+    def cmd_down(self):
+        pass
+
+    def cmd_up(self):
+        pass
+
+    def cmd_kill(self):
+        pass
+
+    def cmd_toggle_floating(self):
+        pass
+
+    def cmd_toscreen(self):
+        pass
+
+
+class FakeGroup(FakeNode):
+    def __init__(self):
+        super().__init__()
+        self.layouts = [FakeNode(), FakeNode()]
+        self.layout = self.layouts[0]
+        self.current_window = FakeNode()
+
+
+class BenchQtile(Qtile):
+    def __init__(self, windows):
+        self.windows_map = {wid: FakeNode(wid) for wid in range(windows)}
+        self.groups_map = {str(i): FakeGroup() for i in range(1, 10)}
+        self.screens = [config.Screen()]
+        self.current_screen = self.screens[0]
+        self.current_screen.group = self.groups_map["1"]
+        self.current_chord = False
+        self.keys_map = {}
+        self._key_calls = {}
+        self.server = IPCCommandServer(self)
+
+    def cmd_spawn(self, cmd):
+        pass
+
+
+def legacy_dispatch(qtile, key):
+    """What process_key_event used to do for every key press"""
+    for cmd in key.commands:
+        if cmd.check(qtile):
+            qtile.server.call((cmd.selectors, cmd.name, cmd.args, cmd.kwargs))
+
+
+def run(name, qtile, dispatch, presses, repeat):
+    keys = [config.Key([], "F{}".format(i + 1), cmd) for i, cmd in enumerate(BINDINGS)]
+    for i, key in enumerate(keys):
+        qtile.keys_map[(i, 0)] = key
+
+    def replay():
+        for i in range(presses):
+            dispatch(qtile, keys[i % len(keys)], i % len(keys))
+
+    best = min(timeit.repeat(replay, number=1, repeat=repeat))
+    print("{:>8}: {:8.1f} us per key press, {:10.0f} key presses/s".format(
+        name, best / presses * 1e6, presses / best
+    ))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--presses", type=int, default=100000)
+    parser.add_argument("-w", "--windows", type=int, default=50)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    legacy = run(
+        "legacy", BenchQtile(args.windows),
+        lambda qtile, key, keysym: legacy_dispatch(qtile, key),
+        args.presses, args.repeat,
+    )
+    compiled = run(
+        "compiled", BenchQtile(args.windows),
+        lambda qtile, key, keysym: qtile.process_key_event(keysym, 0),
+        args.presses, args.repeat,
+    )
+    print("speedup: {:.2f}x".format(legacy / compiled))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Replay a recorded X event stream through Core._xpoll
+
+The stream mimics a busy session: a pointer drag producing MotionNotify events,
+clients spewing title updates through PropertyNotify and a few Expose and
+EnterNotify events in between. The same stream is also dispatched with the
+legacy name-based lookup for comparison, and once more with event coalescing
+enabled.
+
+Run with::
+
+    python -m test.benchmarks.bench_xpoll
+"""
+import argparse
+import logging
+import timeit
+
+import xcffib.xproto
+
+from libqtile.backend.x11 import xcbq
+from libqtile.backend.x11.core import Core
+from libqtile.log_utils import logger
+
+WINDOWS = 20
+
+
+class FakeWindow:
+    def __init__(self, wid):
+        self.window = xcbq.Window(None, wid)
+
+    def handle_PropertyNotify(self, event):  # noqa: N802
+        return False
+
+    def handle_EnterNotify(self, event):  # noqa: N802
+        return True
+
+    def handle_Expose(self, event):  # noqa: N802
+        return False
+
+
+class FakeQtile:
+    def __init__(self):
+        self.windows_map = {wid: FakeWindow(wid) for wid in range(1, WINDOWS + 1)}
+
+    def process_button_motion(self, x, y):
+        pass
+
+
+class FakeXcbConnection:
+    def __init__(self, events):
+        self.events = events
+        self.index = 0
+
+    def poll_for_event(self):
+        try:
+            event = self.events[self.index]
+        except IndexError:
+            return None
+        self.index += 1
+        return event
+
+    def has_error(self):
+        return 0
+
+
+class FakeConnection:
+    def __init__(self, events):
+        self.conn = FakeXcbConnection(events)
+        self.timestamp = 0
+        self.timestamp_probes = 0
+        self.timestamp_window = None
+
+    def flush(self):
+        pass
+
+
+def record_events(count):
+    """Build a stream of events resembling a busy session"""
+    xproto = xcffib.xproto
+    events = []
+    for i in range(count):
+        wid = i % WINDOWS + 1
+        kind = i % 50
+        if kind == 49:
+            events.append(xproto.EnterNotifyEvent.synthetic(
+                0, i, 0, wid, 0, i, i, i, i, 0, 0, 0
+            ))
+        elif kind % 10 == 9:
+            events.append(xproto.ExposeEvent.synthetic(wid, 0, 0, 10, 10, 0))
+        elif kind % 2:
+            events.append(xproto.PropertyNotifyEvent.synthetic(i % 4 + 1, 39, i, 0))
+        else:
+            # pointer grabbed on the root window during a drag
+            events.append(xproto.MotionNotifyEvent.synthetic(
+                0, i, 0, 0, 0, i, i, i, i, 0, True
+            ))
+    return events
+
+
+def make_core(events, coalesce=False):
+    core = Core.__new__(Core)
+    core.qtile = FakeQtile()
+    core.conn = FakeConnection(events)
+    core._dispatch_table = {}
+    core.coalesce_events = coalesce
+    core._events_received = 0
+    core._events_dropped = {}
+    return core
+
+
+def legacy_xpoll(core):
+    """The name-based dispatch that _xpoll used to perform for every event"""
+    event_events = [
+        "EnterNotify",
+        "LeaveNotify",
+        "MotionNotify",
+        "ButtonPress",
+        "ButtonRelease",
+        "KeyPress",
+    ]
+    while True:
+        event = core.conn.conn.poll_for_event()
+        if not event:
+            break
+        event_type = event.__class__.__name__
+        if event_type.endswith("Event"):
+            event_type = event_type[:-5]
+        logger.debug(event_type)
+        handler = "handle_{event_type}".format(event_type=event_type)
+        if hasattr(event, "window"):
+            window = core.qtile.windows_map.get(event.window)
+        elif hasattr(event, "drawable"):
+            window = core.qtile.windows_map.get(event.drawable)
+        elif event_type in event_events:
+            window = core.qtile.windows_map.get(event.event)
+        else:
+            window = None
+        chain = []
+        if window is not None and hasattr(window, handler):
+            chain.append(getattr(window, handler))
+        if hasattr(core, handler):
+            chain.append(getattr(core, handler))
+        for target in chain:
+            logger.debug("Handling: {event_type}".format(event_type=event_type))
+            if not target(event):
+                break
+
+
+def run(name, func, events, repeat, coalesce=False):
+    core = make_core(events, coalesce)
+
+    def replay():
+        core.conn.conn.index = 0
+        func(core)
+
+    best = min(timeit.repeat(replay, number=1, repeat=repeat))
+    print("{:>8}: {:8.1f} ms, {:10.0f} events/s".format(
+        name, best * 1000, len(events) / best
+    ))
+    if coalesce:
+        dropped = core.event_stats()["dropped"] // repeat
+        print("{:>8}  {} of {} events dropped per replay".format("", dropped, len(events)))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--events", type=int, default=100000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    events = record_events(args.events)
+    legacy = run("legacy", legacy_xpoll, events, args.repeat)
+    table = run("table", Core._xpoll, events, args.repeat)
+    coalesced = run("coalesce", Core._xpoll, events, args.repeat, coalesce=True)
+    print("speedup: {:.2f}x, {:.2f}x with coalescing".format(
+        legacy / table, legacy / coalesced
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,7 @@ import pytest
 import libqtile.bar
 import libqtile.config
 import libqtile.confreader
+import libqtile.drawer
 import libqtile.layout
 import libqtile.widget
 
@@ -464,3 +465,146 @@ def test_configure_broken_widgets(manager_nospawn):
     for index, widget in enumerate(widget_list):
         if isinstance(widget, BrokenWidget):
             assert i["widgets"][index]["name"] == "configerrorwidget"
+
+
+class FakeDrawerQtile:
+    def __init__(self):
+        self.callbacks = []
+
+    def call_soon(self, func, *args):
+        self.callbacks.append((func, args))
+
+
+class FakeBackingDrawer:
+    def __init__(self):
+        self.ctx = self
+        self.moved = []
+        self.damaged = []
+
+    def set_source_rgb(self, colour):
+        pass
+
+    def rectangle(self, *area):
+        pass
+
+    def fill(self):
+        pass
+
+    def move(self, *area):
+        self.moved.append(area)
+
+    def _prepare(self):
+        self._surface = None
+
+    def damage(self, *area):
+        self.damaged.append(area)
+
+
+class FakeWidgetDrawer(libqtile.drawer.SharedDrawer):
+    def __init__(self, backing):
+        self.backing = backing
+        self._offset = (0, 0)
+        self.ctx = self
+        self.sources = []
+
+    def set_source_surface(self, surface, x, y):
+        self.sources.append((x, y))
+
+    def paint(self):
+        pass
+
+    def draw(self, offsetx=0, offsety=0, width=None, height=None):
+        self._offset = (offsetx, offsety)
+
+
+class LoggingWidget(libqtile.widget.base._Widget):
+    def __init__(self, length, drawn, backing=None):
+        libqtile.widget.base._Widget.__init__(self, length)
+        self.drawn = drawn
+        self.drawer = FakeWidgetDrawer(backing)
+
+    def draw(self):
+        self.drawn.append(self)
+
+
+def test_partial_draw():
+    drawn = []
+    widgets = [LoggingWidget(10, drawn) for _ in range(5)]
+    b = DBarH(widgets, 10)
+    b.qtile = FakeDrawerQtile()
+    b.drawer = FakeBackingDrawer()
+    b.length = b.width = 100
+    b.height = 10
+    for w in widgets:
+        w.bar = b
+
+    b.draw()
+    b._actual_draw()
+    assert drawn == widgets
+    assert b.drawer.damaged == [(50, 0, 50, 10)]
+    assert (b.full_redraws, b.partial_redraws) == (1, 0)
+
+    # the widgets moved by the ones drawn again only have their pixels moved
+    del drawn[:]
+    b.qtile.callbacks = []
+    widgets[1].length = 15
+    b.draw(widgets[1])
+    b.draw(widgets[3])
+    assert len(b.qtile.callbacks) == 1
+    b._actual_draw()
+    assert drawn == [widgets[1], widgets[3]]
+    assert b.drawer.moved == [(40, 0, 45, 0, 10, 10), (20, 0, 25, 0, 10, 10)]
+    # the pixels moved and the end of the bar, the widgets damage their own
+    assert b.drawer.damaged[1:] == [(45, 0, 10, 10), (25, 0, 10, 10), (55, 0, 45, 10)]
+    assert (b.full_redraws, b.partial_redraws) == (1, 1)
+
+    # consecutive widgets are moved in one piece
+    del drawn[:]
+    b.drawer.moved = []
+    widgets[0].length = 5
+    widgets[1].length = 25
+    b.draw(widgets[0])
+    b.draw(widgets[1])
+    b._actual_draw()
+    assert drawn == [widgets[0], widgets[1]]
+    assert b.drawer.moved == [(25, 0, 30, 0, 30, 10)]
+
+    # widgets sliding by different distances are drawn again
+    del drawn[:]
+    b.drawer.moved = []
+    widgets[1].length = 20
+    widgets[3].length = 5
+    b.draw(widgets[1])
+    b.draw(widgets[3])
+    b._actual_draw()
+    assert drawn == [widgets[1], widgets[3], widgets[2], widgets[4]]
+    assert b.drawer.moved == []
+    assert (b.full_redraws, b.partial_redraws) == (1, 3)
+
+
+def test_partial_draw_mirror():
+    drawn = []
+    backing = FakeBackingDrawer()
+    widgets = [LoggingWidget(10, drawn, backing) for _ in range(3)]
+    mirror = libqtile.widget.base.Mirror(widgets[2])
+    mirror.drawer = FakeWidgetDrawer(backing)
+    b = DBarH(widgets + [mirror], 10)
+    b.qtile = FakeDrawerQtile()
+    b.drawer = backing
+    b.length = b.width = 100
+    b.height = 10
+    for w in b.widgets:
+        w.bar = b
+    b._actual_draw()
+    widgets[2].drawer.draw(offsetx=widgets[2].offset)
+    del drawn[:]
+    mirror.drawer.sources = []
+
+    # the reflected widget slides, the mirror paints from where it now is
+    widgets[0].length = 15
+    b.draw(widgets[0])
+    b._actual_draw()
+    assert widgets[2] not in drawn
+    mirror._length = mirror.length
+    mirror.draw()
+    assert set(mirror.drawer.sources) == {(-25, 0)}
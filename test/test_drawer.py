@@ -0,0 +1,123 @@
+from libqtile import drawer
+from libqtile.drawer import TextCache, TextLayout, merge_areas
+
+
+def test_merge_areas_horizontal():
+    areas = [(30, 0, 10, 24), (0, 0, 10, 24), (10, 0, 20, 24), (50, 0, 5, 24), (0, 0, 10, 24)]
+    assert merge_areas(areas) == [(0, 0, 40, 24), (50, 0, 5, 24)]
+
+
+def test_merge_areas_vertical():
+    areas = [(0, 20, 24, 10), (0, 0, 24, 20), (0, 35, 24, 5), (0, 38, 24, 10)]
+    assert merge_areas(areas) == [(0, 0, 24, 30), (0, 35, 24, 13)]
+
+
+def test_merge_areas_contained():
+    assert merge_areas([(0, 0, 100, 24), (20, 0, 10, 24)]) == [(0, 0, 100, 24)]
+    assert merge_areas([]) == []
+
+
+class FakeLayout:
+    def __init__(self):
+        self.measured = 0
+        self.description = FakeFontDescription()
+
+    def set_alignment(self, alignment):
+        pass
+
+    def set_ellipsize(self, ellipsize):
+        pass
+
+    def set_font_description(self, description):
+        pass
+
+    def get_font_description(self):
+        return self.description
+
+    def set_text(self, text):
+        pass
+
+    def get_pixel_size(self):
+        self.measured += 1
+        return (self.measured, 10)
+
+
+class FakeFontDescription:
+    def set_family(self, family):
+        pass
+
+    def set_size(self, size):
+        pass
+
+    def set_absolute_size(self, size):
+        pass
+
+
+class FakeContext:
+    def __init__(self):
+        self.calls = []
+
+    def create_layout(self):
+        return FakeLayout()
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append(name)
+
+
+class FakeDrawer:
+    def __init__(self):
+        self.ctx = FakeContext()
+
+    def set_source_rgb(self, colour):
+        pass
+
+
+def test_text_cache():
+    cache = TextCache(size=2)
+    layout = FakeLayout()
+    assert cache.get("a", layout.get_pixel_size) == (1, 10)
+    assert cache.get("b", layout.get_pixel_size) == (2, 10)
+    assert cache.get("a", layout.get_pixel_size) == (1, 10)
+    # "b" was the least recently used
+    assert cache.get("c", layout.get_pixel_size) == (3, 10)
+    assert cache.get("a", layout.get_pixel_size) == (1, 10)
+    assert cache.get("b", layout.get_pixel_size) == (4, 10)
+    assert cache.stats() == dict(hits=2, misses=4, hit_rate=2 / 6, entries=2, size=2)
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+    assert cache.stats()["hit_rate"] == 0
+
+
+def test_rasterized_text(monkeypatch):
+    monkeypatch.setattr(drawer, "text_surfaces", TextCache(size=16))
+    monkeypatch.setattr(TextLayout, "_rasterize", lambda self: (object(), 2))
+    layout = TextLayout(FakeDrawer(), "12:00", "ffffff", "sans", 12, None, rasterize=True)
+
+    layout.draw(0, 0)
+    layout.draw(10, 0)
+    assert drawer.text_surfaces.stats()["hits"] == 1
+    assert drawer.text_surfaces.stats()["misses"] == 1
+
+    # anything changing how the text looks is drawn again
+    layout.colour = "ff0000"
+    layout.draw(0, 0)
+    layout.font_shadow = "000000"
+    layout.draw(0, 0)
+    layout.font_size = 14
+    layout.draw(0, 0)
+    layout.font_family = "mono"
+    layout.draw(0, 0)
+    layout.text = "12:01"
+    layout.draw(0, 0)
+    assert drawer.text_surfaces.stats()["misses"] == 6
+    layout.text = "12:00"
+    layout.draw(0, 0)
+    assert drawer.text_surfaces.stats()["hits"] == 2
+
+    # gradients are drawn with pango every time
+    layout.drawer.ctx.calls.clear()
+    layout.colour = ["ffffff", "000000"]
+    layout.draw(0, 0)
+    assert drawer.text_surfaces.stats()["hits"] + drawer.text_surfaces.stats()["misses"] == 8
+    assert "show_layout" in layout.drawer.ctx.calls
@@ -0,0 +1,147 @@
+from libqtile.group import _Group
+
+
+class FakeQtile:
+    def __init__(self):
+        self.callbacks = []
+
+    def call_soon(self, func, *args):
+        self.callbacks.append((func, args))
+
+    def run_callbacks(self):
+        callbacks, self.callbacks = self.callbacks, []
+        for func, args in callbacks:
+            func(*args)
+
+
+def make_group():
+    group = _Group("a")
+    group.qtile = FakeQtile()
+    group.screen = object()
+    group.windows = {object()}
+    group.layouts_done = []
+    group._layout_all = group.layouts_done.append
+    return group
+
+
+def test_layout_all_deferred():
+    group = make_group()
+    group.layout_all()
+    group.layout_all(warp=True)
+    group.layout_all()
+    assert group.layouts_done == []
+    assert len(group.qtile.callbacks) == 1
+
+    group.qtile.run_callbacks()
+    assert group.layouts_done == [True]
+
+    group.layout_all()
+    group.qtile.run_callbacks()
+    assert group.layouts_done == [True, False]
+
+
+def test_layout_all_forced():
+    group = make_group()
+    group.layout_all(warp=True)
+    group.layout_all(force=True)
+    assert group.layouts_done == [False]
+
+    # the pending layout was done by the forced one
+    group.qtile.run_callbacks()
+    assert group.layouts_done == [False]
+
+
+def test_layout_all_nothing_to_do():
+    group = make_group()
+    group.windows = set()
+    group.layout_all()
+    assert group.qtile.callbacks == []
+
+
+class FakeWindow:
+    floating = False
+    width = 10
+    height = 20
+
+    def __init__(self, hidden=False):
+        self.window = self
+        self.hidden = hidden
+        self.events = []
+
+    def focus(self, warp):
+        if self.hidden:
+            return False
+        self.events.append(("focus", warp))
+        return True
+
+    def warp_pointer(self, x, y):
+        self.events.append(("warp", x, y))
+
+    def _disable_mask(self, mask):
+        pass
+
+    def _reset_mask(self):
+        pass
+
+
+class FakeLayout:
+    """Shows the focused window only, like Max"""
+    focused = None
+
+    def focus(self, win):
+        self.focused = win
+
+    def blur(self):
+        pass
+
+    def layout(self, windows, screen_rect):
+        for win in windows:
+            win.hidden = win is not self.focused
+
+
+class FakeScreen:
+    def get_rect(self):
+        return None
+
+
+def test_focus_before_layout():
+    group = _Group("a")
+    group.qtile = FakeQtile()
+    group.qtile._drag = None
+    group.qtile.config = type("Config", (), {"cursor_warp": True})
+    group.qtile.current_screen = group.screen = FakeScreen()
+    group.layouts = [FakeLayout()]
+    group.current_layout = 0
+    group.floating_layout = FakeLayout()
+    win = FakeWindow()
+    group.windows = {win}
+
+    group.focus(win, warp=True)
+    # X focus moved right away, the pointer is warped once laid out
+    assert win.events == [("focus", False)]
+    group.qtile.run_callbacks()
+    assert win.events == [("focus", False), ("warp", 5, 10)]
+
+    group.focus(win, warp=False, force_layout=True)
+    assert win.events[2:] == [("focus", False)]
+    assert group.qtile.callbacks == []
+
+
+def test_focus_hidden_window():
+    group = _Group("a")
+    group.qtile = FakeQtile()
+    group.qtile._drag = None
+    group.qtile.config = type("Config", (), {"cursor_warp": True})
+    group.qtile.current_screen = group.screen = FakeScreen()
+    group.layouts = [FakeLayout()]
+    group.current_layout = 0
+    group.floating_layout = FakeLayout()
+    shown, hidden = FakeWindow(), FakeWindow(hidden=True)
+    group.windows = {shown, hidden}
+
+    group.focus(hidden, warp=True)
+    assert hidden.events == []
+    # focused once the layout has shown it
+    group.qtile.run_callbacks()
+    assert hidden.events == [("focus", True)]
+    assert shown.hidden
@@ -134,6 +134,62 @@ def test_can_unsubscribe_from_hook():
     assert test.val == 3
 
 
+@pytest.mark.usefixtures("hook_fixture")
+def test_debounced_subscriber():
+    calls = []
+
+    @hook.debounce
+    def debounced(val):
+        calls.append(val)
+
+    hook.subscribe.group_window_add(debounced)
+    # without an event loop, subscribers are called right away
+    hook.fire("group_window_add", 1)
+    assert calls == [1]
+
+    async def t():
+        test = Call(0)
+        hook.subscribe.group_window_add(test)
+        for i in range(2, 5):
+            hook.fire("group_window_add", i)
+        assert test.val == 4
+        assert calls == [1]
+        await asyncio.sleep(0)
+        assert calls == [1, 4]
+
+        hook.fire("group_window_add", 5)
+        hook.unsubscribe.group_window_add(debounced)
+        await asyncio.sleep(0)
+        assert calls == [1, 4]
+
+    asyncio.run(t())
+
+
+@pytest.mark.usefixtures("hook_fixture")
+def test_hook_stats(monkeypatch):
+    one = Call(0)
+    two = Call(0)
+    hook.subscribe.group_window_add(one)
+    hook.subscribe.group_window_add(two)
+    hook.subscribe.setgroup(one)
+    hook.fire("group_window_add", 1)
+    hook.fire("group_window_add", 2)
+
+    stats = hook.stats()
+    assert set(stats) == {"group_window_add", "setgroup"}
+    # subscribers of the same class are accounted together
+    call = stats["group_window_add"]["test.test_hook.Call"]
+    assert call["calls"] == 4
+    assert 0 < call["max"] <= call["total"]
+    assert stats["setgroup"]["test.test_hook.Call"]["calls"] == 0
+
+    slow = []
+    monkeypatch.setattr(hook, "slow_subscriber_threshold", 0)
+    monkeypatch.setattr(hook, "_warn_slow", lambda event, stats, elapsed: slow.append(event))
+    hook.fire("setgroup", 3)
+    assert slow == ["setgroup"]
+
+
 class SubscribeStartupHooksConfig(BareConfig):
     def __init__(self):
         super().__init__()
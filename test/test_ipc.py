@@ -0,0 +1,439 @@
+import asyncio
+import os
+import threading
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from libqtile import hook, ipc
+from libqtile.command.base import (
+    CommandError,
+    CommandException,
+    CommandObject,
+    executor_safe,
+    ipc_coroutine,
+)
+from libqtile.command.client import InteractiveCommandClient
+from libqtile.command.graph import CommandGraphRoot
+from libqtile.command.interface import (
+    BATCH,
+    IPCCommandInterface,
+    IPCCommandServer,
+    IPCHookSubscription,
+    QtileCommandInterface,
+)
+
+
+def echo(msg):
+    return msg
+
+
+def run_with_server(handler, func):
+    """Start a server with the given handler and run the coroutine function"""
+    async def main(socket_path):
+        async with ipc.Server(socket_path, handler):
+            return await func(socket_path)
+
+    with TemporaryDirectory() as tempdir:
+        return asyncio.run(main(os.path.join(tempdir, "qtilesocket")))
+
+
+@pytest.mark.parametrize("is_json", [True, False])
+def test_one_shot(is_json):
+    async def func(socket_path):
+        client = ipc.Client(socket_path, is_json=is_json)
+        return await client.async_send(["one", "shot"])
+
+    assert run_with_server(echo, func) == ["one", "shot"]
+
+
+@pytest.mark.parametrize("is_json", [True, False])
+def test_persistent(is_json):
+    connections = []
+
+    def handler(msg):
+        connections.append(msg)
+        return msg * 2
+
+    async def func(socket_path):
+        client = ipc.Client(socket_path, is_json=is_json, persistent=True)
+        try:
+            first = await client.async_send(1)
+            writer = client._writer
+            second = await client.async_send(2)
+            assert client._writer is writer
+            return first, second
+        finally:
+            await client.async_close()
+
+    assert run_with_server(handler, func) == (2, 4)
+    assert connections == [1, 2]
+
+
+def test_persistent_concurrent():
+    async def func(socket_path):
+        client = ipc.Client(socket_path, persistent=True)
+        try:
+            return await asyncio.gather(*[client.async_send(i) for i in range(20)])
+        finally:
+            await client.async_close()
+
+    assert run_with_server(echo, func) == list(range(20))
+
+
+def test_persistent_reconnect():
+    async def func(socket_path):
+        client = ipc.Client(socket_path, persistent=True)
+        assert await client.async_send("first") == "first"
+        await client.async_close()
+        assert await client.async_send("second") == "second"
+        await client.async_close()
+
+    run_with_server(echo, func)
+
+
+def test_persistent_no_server():
+    with TemporaryDirectory() as tempdir:
+        client = ipc.Client(os.path.join(tempdir, "nothing"), persistent=True)
+        with pytest.raises(ipc.IPCError):
+            client.send("hello")
+        client.close()
+
+
+@pytest.mark.parametrize("value", [
+    None, True, False, 0, 127, 128, -1, -32, -33, 255, 256, 65536, 2 ** 40,
+    -2 ** 40, 2 ** 64 - 1, -2 ** 63, 1.5, "", "name", "é" * 40, "x" * 70000,
+    b"\x00\xff", b"x" * 300, [], [1, [2, "three"]], (), (1, ("two", None)),
+    list(range(20)), {}, {"id": 1, 2: [3.0]}, {str(i): i for i in range(20)},
+])
+def test_binary_roundtrip(value):
+    assert ipc.loads_binary(ipc.dumps_binary(value)) == value
+
+
+def test_binary_errors():
+    assert ipc.loads_binary(ipc.dumps_binary({1, 2})) == [1, 2]
+    with pytest.raises(ipc.IPCError):
+        ipc.dumps_binary(object())
+    with pytest.raises(ipc.IPCError):
+        ipc.dumps_binary(2 ** 64)
+    with pytest.raises(ipc.IPCError):
+        ipc.loads_binary(ipc.dumps_binary("truncated")[:-1])
+    with pytest.raises(ipc.IPCError):
+        ipc.loads_binary(ipc.dumps_binary([1]) + b"\x00")
+
+
+@pytest.mark.parametrize("persistent", [True, False])
+def test_binary_client(persistent):
+    async def func(socket_path):
+        client = ipc.Client(socket_path, codec=ipc.CODEC_BINARY, persistent=persistent)
+        try:
+            return await client.async_send(([("group", "a")], "info", (), {}))
+        finally:
+            await client.async_close()
+
+    assert run_with_server(echo, func) == ([("group", "a")], "info", (), {})
+
+
+@pytest.mark.parametrize("data, reply", [
+    (b'["unframed", "json"]', b'["unframed", "json"]'),
+    (ipc._IPC.pack(("unframed", "marshal")), ipc._IPC.pack(("unframed", "marshal"))),
+])
+def test_unframed(data, reply):
+    async def func(socket_path):
+        reader, writer = await asyncio.open_unix_connection(path=socket_path)
+        writer.write(data)
+        writer.write_eof()
+        try:
+            return await reader.read()
+        finally:
+            writer.close()
+
+    assert run_with_server(echo, func) == reply
+
+
+def test_unsupported_version():
+    async def func(socket_path):
+        reader, writer = await asyncio.open_unix_connection(path=socket_path)
+        writer.write(ipc.PREAMBLE + bytes([ipc.PROTOCOL_VERSION + 1]))
+        writer.write(ipc._IPC.pack_frame(1, "hello", ipc.CODEC_JSON))
+        try:
+            return await reader.read()
+        finally:
+            writer.close()
+
+    assert run_with_server(echo, func) == b""
+
+
+class FakeLayout(CommandObject):
+    def __init__(self, name):
+        self.name = name
+
+    def _items(self, name):
+        return None
+
+    def _select(self, name, sel):
+        return None
+
+    def cmd_name(self):
+        return self.name
+
+
+class FakeQtile(CommandObject):
+    def __init__(self):
+        self.calls = []
+        self.layout = FakeLayout("max")
+
+    def _items(self, name):
+        if name == "layout":
+            return True, [0]
+        return None
+
+    def _select(self, name, sel):
+        if name == "layout":
+            return self.layout
+        return None
+
+    def cmd_echo(self, value):
+        self.calls.append(value)
+        return value
+
+    def cmd_fail(self):
+        raise CommandError("failed")
+
+    def cmd_crash(self):
+        raise ZeroDivisionError
+
+    async def cmd_wait(self, event):
+        await getattr(self, event).wait()
+        return event
+
+    @executor_safe
+    def cmd_thread(self):
+        return threading.current_thread() is threading.main_thread()
+
+    async def _state_async(self, prefix):
+        await asyncio.sleep(0)
+        return prefix + "ipc"
+
+    @ipc_coroutine(_state_async)
+    def cmd_state(self, prefix):
+        return prefix + "loop"
+
+
+def test_batch():
+    qtile = FakeQtile()
+
+    async def func(socket_path):
+        def flush():
+            client = ipc.Client(socket_path)
+            batch = IPCCommandInterface(client).batch()
+            c = InteractiveCommandClient(batch)
+            assert c.echo(1) == 0
+            assert c.fail() == 1
+            assert c.echo(2) == 2
+            c.crash()
+            c.missing()
+            c.group["nope"].info()
+            assert len(batch) == 6
+            return batch.flush(return_exceptions=True), batch.flush()
+
+        return await asyncio.get_event_loop().run_in_executor(None, flush)
+
+    results, empty = run_with_server(IPCCommandServer(qtile).call, func)
+    assert empty == []
+    assert qtile.calls == [1, 2]
+    assert results[0] == 1
+    assert isinstance(results[1], CommandError)
+    assert results[2] == 2
+    assert isinstance(results[3], CommandException)
+    assert isinstance(results[4], CommandError)
+    assert isinstance(results[5], CommandError)
+
+
+def test_batch_raises():
+    async def func(socket_path):
+        def flush():
+            batch = IPCCommandInterface(ipc.Client(socket_path)).batch()
+            c = InteractiveCommandClient(batch)
+            c.fail()
+            c.echo(1)
+            with pytest.raises(CommandError):
+                batch.flush()
+
+        await asyncio.get_event_loop().run_in_executor(None, flush)
+
+    qtile = FakeQtile()
+    run_with_server(IPCCommandServer(qtile).call, func)
+    # the calls after the failure still ran
+    assert qtile.calls == [1]
+
+
+class FakeWindow:
+    def info(self):
+        return {"name": "window", "id": 1}
+
+
+def test_stream():
+    async def replies(count):
+        for i in range(count):
+            yield i
+
+    async def func(socket_path):
+        client = ipc.Client(socket_path)
+        return [rep async for rep in client.async_stream(3)]
+
+    assert run_with_server(replies, func) == [0, 1, 2]
+
+
+def test_subscribe():
+    async def func(socket_path):
+        def receive(events):
+            client = IPCCommandInterface(ipc.Client(socket_path))
+            for event in client.subscribe(["client_new", "setgroup"]):
+                events.append(event)
+                if len(events) == 3:
+                    break
+
+        events = []
+        loop = asyncio.get_event_loop()
+        receiving = loop.run_in_executor(None, receive, events)
+        while not hook.subscriptions.get("setgroup"):
+            await asyncio.sleep(0.01)
+        hook.fire("client_new", FakeWindow())
+        hook.fire("focus_change")
+        hook.fire("setgroup")
+        hook.fire("client_new", object())
+        await receiving
+        # wait for the server to notice the client left
+        while hook.subscriptions["setgroup"]:
+            await asyncio.sleep(0.01)
+        return events
+
+    hook.clear()
+    events = run_with_server(IPCCommandServer(FakeQtile()).call, func)
+    assert events[0] == {"hook": "client_new", "args": [{"name": "window", "id": 1}], "dropped": 0}
+    assert events[1] == {"hook": "setgroup", "args": [], "dropped": 0}
+    assert events[2]["hook"] == "client_new"
+    assert events[2]["args"][0].startswith("<object object")
+    assert hook.subscriptions["client_new"] == []
+
+
+def test_subscribe_unknown():
+    async def func(socket_path):
+        def receive():
+            client = IPCCommandInterface(ipc.Client(socket_path))
+            with pytest.raises(CommandError):
+                list(client.subscribe(["client_new", "nope"]))
+
+        await asyncio.get_event_loop().run_in_executor(None, receive)
+
+    hook.clear()
+    run_with_server(IPCCommandServer(FakeQtile()).call, func)
+    assert not hook.subscriptions.get("client_new")
+
+
+def test_subscription_overflow():
+    async def func():
+        subscription = IPCHookSubscription(["setgroup"])
+        subscription.max_queued = 3
+        stream = subscription.stream()
+        assert await stream.__anext__() == (0, None)
+        for i in range(5):
+            hook.fire("setgroup", i)
+        events = [await stream.__anext__() for _ in range(3)]
+        await stream.aclose()
+        return events
+
+    hook.clear()
+    events = asyncio.run(func())
+    assert [event["args"] for _, event in events] == [[2], [3], [4]]
+    assert [event["dropped"] for _, event in events] == [2, 0, 0]
+    assert hook.subscriptions["setgroup"] == []
+
+
+def test_async_commands():
+    qtile = FakeQtile()
+    server = IPCCommandServer(qtile)
+
+    async def func(socket_path):
+        qtile.released = asyncio.Event()
+        client = ipc.Client(socket_path, persistent=True)
+        try:
+            waiting = asyncio.ensure_future(client.async_send(([], "wait", ("released",), {})))
+            # the connection is still served while the command waits
+            assert await client.async_send(([], "echo", (1,), {})) == (0, 1)
+            assert not waiting.done()
+            qtile.released.set()
+            assert await waiting == (0, "released")
+            assert await client.async_send(([], "thread", (), {})) == (0, False)
+            status, result = await client.async_send(([], "wait", ("missing",), {}))
+            assert status == 2
+        finally:
+            await client.async_close()
+
+    run_with_server(server.handle, func)
+    stats = server.command_stats()
+    assert stats["wait"]["calls"] == 2
+    assert stats["wait"]["loop_total"] == 0
+    assert stats["thread"]["calls"] == 1
+    assert stats["echo"]["calls"] == 1
+    assert stats["echo"]["loop_max"] == stats["echo"]["max"]
+
+
+def test_call_schedules_coroutines():
+    qtile = FakeQtile()
+    server = IPCCommandServer(qtile)
+
+    async def func():
+        qtile.released = asyncio.Event()
+        qtile.released.set()
+        assert server.call(([], "wait", ("released",), {})) == (0, None)
+        # executor_safe commands run right away outside of IPC
+        assert server.call(([], "thread", (), {})) == (0, True)
+        await asyncio.sleep(0)
+
+    asyncio.run(func())
+    assert server.command_stats()["wait"]["calls"] == 1
+
+
+def test_ipc_coroutine():
+    qtile = FakeQtile()
+    server = IPCCommandServer(qtile)
+    call = ([], "state", ("get_",), {})
+
+    async def func(socket_path):
+        client = ipc.Client(socket_path, persistent=True)
+        try:
+            # IPC clients get the result of the coroutine
+            assert await client.async_send(call) == (0, "get_ipc")
+            # synchronous everywhere else, even in a batch sent over IPC
+            assert await client.async_send((BATCH, [call])) == (0, [(0, "get_loop")])
+        finally:
+            await client.async_close()
+
+    run_with_server(server.handle, func)
+    assert server.call(call) == (0, "get_loop")
+    assert server.compile([], "state")(("get_",), {}) == (0, "get_loop")
+    assert QtileCommandInterface(qtile).execute(
+        CommandGraphRoot().call("state"), ("get_",), {}
+    ) == "get_loop"
+
+
+def test_compile():
+    qtile = FakeQtile()
+    server = IPCCommandServer(qtile)
+    assert server.compile([], "echo")((1,), {}) == (0, 1)
+    assert server.compile([], "fail")((), {}) == (1, "failed")
+    assert server.compile([], "missing")((), {})[0] == 1
+
+    name = server.compile([("layout", None)], "name")
+    assert name((), {}) == (0, "max")
+    # the current layout is selected again on every call
+    qtile.layout = FakeLayout("stack")
+    assert name((), {}) == (0, "stack")
+    assert server.compile([("layout", 0)], "name")((), {}) == (0, "stack")
+    assert server.compile([("layout", 1)], "name")((), {})[0] == 1
+    assert server.compile([("layout", None)], "missing")((), {})[0] == 1
+    assert server.compile([("window", None)], "name")((), {})[0] == 1
+    assert qtile.calls == [1]
+    assert server.command_stats()["layout.name"]["calls"] == 3
@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+
+from libqtile.command.base import CommandError
+from libqtile.core.loop import LoopContext, LoopMonitor
+from libqtile.core.manager import Qtile
+
+
+def test_loop_monitor():
+    monitor = LoopMonitor()
+    monitor.interval = 0.01
+    monitor.stall_threshold = 0.1
+
+    def block():
+        time.sleep(0.3)
+
+    async def main():
+        async with LoopContext(monitor=monitor):
+            await asyncio.sleep(0.05)
+            block()
+            await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    stats = monitor.stats()
+    assert stats["beats"] > 2
+    assert stats["max_lag"] >= 0.2
+    assert stats["mean_lag"] < stats["max_lag"]
+    assert len(stats["stalls"]) == 1
+    stall = stats["stalls"][0]
+    assert stall["duration"] >= 0.2
+    assert "in block" in stall["stack"][-1]
+    # the watchdog is gone
+    assert monitor._watchdog is None
+
+
+def test_loop_monitor_stack():
+    # the watchdog polls faster than the heartbeat to catch short stalls
+    monitor = LoopMonitor()
+    monitor.stall_threshold = 0.1
+
+    async def main():
+        async with LoopContext(monitor=monitor):
+            await asyncio.sleep(monitor.interval - 0.05)
+            time.sleep(0.3)
+            await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    stall = monitor.stats()["stalls"][0]
+    assert "in main" in stall["stack"][-1]
+
+
+def test_loop_not_monitored():
+    async def main():
+        async with LoopContext(monitor=None):
+            await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    qtile = Qtile.__new__(Qtile)
+    qtile.loop_monitor = None
+    with pytest.raises(CommandError):
+        qtile.cmd_loop_stats()
@@ -26,6 +26,7 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import asyncio
 import logging
 
 import pytest
@@ -35,6 +36,7 @@ import xcffib.xtest
 import libqtile.bar
 import libqtile.config
 import libqtile.confreader
+import libqtile.group
 import libqtile.hook
 import libqtile.layout
 import libqtile.widget
@@ -44,6 +46,7 @@ from libqtile.command.client import SelectError
 from libqtile.command.interface import CommandError, CommandException
 from libqtile.config import Match
 from libqtile.confreader import Config
+from libqtile.core.manager import Qtile
 from libqtile.lazy import lazy
 from test import conftest
 from test.conftest import BareConfig, Retry, no_xinerama
@@ -1592,3 +1595,243 @@ def test_cursor_warp(manager):
     assert p.win_x == 25
     assert p.win_y == 25
     assert p.same_screen
+
+
+@manager_config
+def test_client_list(manager):
+    conn = xcbq.Connection(manager.display)
+
+    @Retry(ignore_exceptions=(AssertionError,), fail_msg="Client lists not updated")
+    def assert_client_lists(client_list, stacking):
+        root = conn.default_screen.root
+        assert list(root.get_property("_NET_CLIENT_LIST", unpack=int)) == client_list
+        assert list(root.get_property("_NET_CLIENT_LIST_STACKING", unpack=int)) == stacking
+
+    one = manager.test_window("one")
+    wid_one = manager.c.window.info()["id"]
+    manager.test_window("two")
+    wid_two = manager.c.window.info()["id"]
+    assert_client_lists([wid_one, wid_two], [wid_one, wid_two])
+
+    # floating windows are raised
+    manager.c.group.focus_back()
+    manager.c.window.enable_floating()
+    assert_client_lists([wid_one, wid_two], [wid_two, wid_one])
+
+    manager.test_window("three")
+    wid_three = manager.c.window.info()["id"]
+    assert_client_lists([wid_one, wid_two, wid_three], [wid_two, wid_one, wid_three])
+
+    manager.kill_window(one)
+    assert_client_lists([wid_two, wid_three], [wid_two, wid_three])
+    conn.finalize()
+
+
+class FakeMouseCore:
+    refresh_rate = 50.
+
+    def __init__(self):
+        self.conn = self
+        self.pointer_grabbed = False
+
+    def flush(self):
+        pass
+
+    def ungrab_buttons(self):
+        pass
+
+    def grab_button(self, mouse):
+        return xcbq.translate_masks(mouse.modifiers)
+
+    def grab_pointer(self):
+        self.pointer_grabbed = True
+
+    def ungrab_pointer(self):
+        self.pointer_grabbed = False
+
+
+class FakeMouseGroup:
+    current_window = None
+
+
+class FakeMouseServer:
+    def __init__(self):
+        self.resolved = []
+        self.moves = []
+
+    def call(self, data):
+        return 0, (10, 20)
+
+    def resolve(self, selectors, name):
+        self.resolved.append(name)
+        return lambda x, y: self.moves.append((x, y))
+
+
+def test_mouse_drag():
+    qtile = Qtile.__new__(Qtile)
+    qtile.core = FakeMouseCore()
+    qtile.server = FakeMouseServer()
+    qtile.config = Config()
+    qtile.config.mouse = [
+        libqtile.config.Drag(["mod4"], "Button1", lazy.window.set_position_floating(),
+                             start=lazy.window.get_position(), focus=None),
+        libqtile.config.Click(["mod4"], "Button2", lazy.window.toggle_floating()),
+    ]
+    qtile.valid_mask = 0xff
+    qtile.current_screen = libqtile.config.Screen()
+    qtile.current_screen.group = FakeMouseGroup()
+    qtile.mouse_map = {}
+    qtile._drag = None
+    qtile._drag_position = None
+    qtile._drag_time = 0.
+    qtile._drag_scheduled = False
+    qtile.grab_mouse()
+    assert set(qtile.mouse_map) == {(1, xcbq.ModMasks["mod4"]), (2, xcbq.ModMasks["mod4"])}
+
+    async def drag():
+        qtile._eventloop = asyncio.get_event_loop()
+        # no binding without the modifier
+        qtile.process_button_click(1, 0, 0, 0, None)
+        assert qtile._drag is None
+
+        qtile.process_button_click(1, xcbq.ModMasks["mod4"], 100, 100, None)
+        assert qtile.core.pointer_grabbed
+        for i in range(1, 11):
+            qtile.process_button_motion(100 + i, 100 + 2 * i)
+        # the first motion is applied right away, the others at the next frame
+        assert qtile.server.moves == [(11, 22)]
+        await asyncio.sleep(2 / qtile.core.refresh_rate)
+        assert qtile.server.moves == [(11, 22), (20, 40)]
+
+        qtile.process_button_motion(115, 130)
+        qtile.process_button_release(1)
+        assert qtile.server.moves == [(11, 22), (20, 40), (25, 50)]
+        assert not qtile.core.pointer_grabbed
+        assert qtile.server.resolved == ["set_position_floating"]
+
+    asyncio.run(drag())
+
+
+class FakeManageXWindow:
+    wid = 1
+    override_redirect = False
+
+    def __init__(self, events):
+        self.events = events
+        self.snapshots = []
+
+    def take_snapshot(self, properties=None):
+        self.snapshots.append(properties)
+
+    def set_attribute(self, eventmask):
+        self.snapshots.append(eventmask)
+
+    def release_snapshot(self):
+        pass
+
+    def get_attributes(self):
+        return self
+
+    def get_property(self, name):
+        return None
+
+    def get_wm_type(self):
+        return None
+
+    def get_net_wm_state(self):
+        return []
+
+    def map(self):
+        self.events.append("map")
+
+
+class FakeManageClient:
+    group = None
+    strut = None
+    defunct = False
+    floating = False
+    minimized = False
+    _window_mask = 42
+
+    def __init__(self, w, qtile):
+        self.window = w
+        self.events = w.events
+
+    def can_steal_focus(self):
+        return True
+
+    def focus(self, warp):
+        self.events.append("focus")
+
+    def _disable_mask(self, mask):
+        pass
+
+    def _reset_mask(self):
+        pass
+
+
+class FakeManageLayout:
+    def match(self, win):
+        return False
+
+    def add(self, win):
+        pass
+
+    def focus(self, win):
+        pass
+
+    def blur(self):
+        pass
+
+    def layout(self, windows, screen_rect):
+        for win in windows:
+            win.events.append("configure")
+
+
+class FakeManageScreen:
+    index = 0
+
+    def get_rect(self):
+        return None
+
+
+def test_manage_lays_out_before_map(monkeypatch):
+    monkeypatch.setattr(libqtile.window, "Window", FakeManageClient)
+    qtile = Qtile.__new__(Qtile)
+    qtile.config = Config()
+    qtile.windows_map = {}
+    qtile._drag = None
+    qtile.append_to_client_list = lambda wid: None
+    qtile.current_screen = FakeManageScreen()
+    group = libqtile.group._Group("a")
+    group.qtile = qtile
+    group.layouts = [FakeManageLayout()]
+    group.current_layout = 0
+    group.floating_layout = FakeManageLayout()
+    group.screen = qtile.current_screen
+    qtile.current_screen.group = group
+
+    events = []
+    libqtile.hook.clear()
+    w = FakeManageXWindow(events)
+    qtile.map_window(w)
+    # the layout isn't left to the end of the event loop iteration
+    assert events == ["configure", "focus", "map"]
+    assert not group._layout_queued
+    # events are selected before the properties are all read
+    assert w.snapshots == [[("QTILE_INTERNAL", "CARDINAL")], 42, None]
+
+
+def test_manage_snapshots_managed_windows_only():
+    qtile = Qtile.__new__(Qtile)
+    qtile.windows_map = {}
+
+    w = FakeManageXWindow([])
+    w.override_redirect = True
+    assert qtile.manage(w) is None
+    assert w.snapshots == [[("QTILE_INTERNAL", "CARDINAL")]]
+
+    w = FakeManageXWindow([])
+    qtile.windows_map[w.wid] = client = object()
+    assert qtile.manage(w) is client
+    assert w.snapshots == [[("QTILE_INTERNAL", "CARDINAL")]]
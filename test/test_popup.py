@@ -33,6 +33,7 @@ def test_popup_focus(manager):
 
     # we have to add .conn so that Popup thinks this is libqtile.qtile
     manager.conn = xcbq.Connection(manager.display)
+    manager.config = BareConfig()
 
     try:
         popup = Popup(manager)
@@ -47,3 +48,20 @@ def test_popup_focus(manager):
     finally:
         popup.kill()
         manager.conn.finalize()
+
+
+@pytest.mark.parametrize("manager", [BareConfig], indirect=True)
+def test_popup_border(manager):
+    manager.windows_map = {}
+    manager.conn = xcbq.Connection(manager.display)
+    manager.config = BareConfig()
+
+    try:
+        popup = Popup(manager, border_width=2)
+        # the border set up by the popup is known when placing it
+        assert popup.win._placed_borderwidth == 2
+        popup.place()
+        assert popup.win.window.get_geometry().border_width == 2
+    finally:
+        popup.kill()
+        manager.conn.finalize()
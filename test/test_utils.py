@@ -63,6 +63,15 @@ def test_rgb_from_base10_tuple_with_alpha():
     assert utils.rgb([255, 255, 0, 0.5]) == (1, 1, 0, 0.5)
 
 
+def test_rgb_strings_cached():
+    assert utils.rgb("#ff0000.5") == (1, 0, 0, 0.5)
+    assert utils.rgb("#ff0000.5") is utils.rgb("#ff0000.5")
+    assert utils.rgb("ff0000") == (1, 0, 0, 1)
+    with pytest.raises(ValueError):
+        utils.rgb("red")
+    assert "red" not in utils._rgb_strings
+
+
 def test_scrub_to_utf8():
     assert utils.scrub_to_utf8(b"foo") == "foo"
 
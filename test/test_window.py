@@ -224,3 +224,31 @@ def test_both_size_hints(manager):
     finally:
         w.kill_client()
         conn.finalize()
+
+
+@bare_config
+def test_skip_redundant_configures(manager):
+    manager.test_window('one')
+
+    def suppressed():
+        return manager.c.window.info()['suppressed_requests']
+
+    before = suppressed()
+    manager.c.window.place(10, 20, 50, 60, 3, '123456')
+    assert suppressed() == before
+
+    # geometry, notify, border width and colour are all unchanged
+    manager.c.window.place(10, 20, 50, 60, 3, '123456')
+    assert suppressed() == before + 4
+
+    # only the colour is sent
+    manager.c.window.place(10, 20, 50, 60, 3, '654321')
+    assert suppressed() == before + 7
+
+    # the window is still raised
+    manager.c.window.place(10, 20, 50, 60, 3, '654321', above=True)
+    assert suppressed() == before + 10
+
+    manager.c.window.place(10, 20, 50, 60, 3, '654321', force=True)
+    assert suppressed() == before + 10
+    assert manager.c.window.info()['x'] == 10